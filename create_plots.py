@@ -1,8 +1,11 @@
+import os
+import json
 import itertools
 from itertools import zip_longest
-from functools import partial
-from typing import Sequence, Tuple
+from functools import partial, lru_cache
+from typing import Callable, Sequence, Tuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 import torch
 import pandas as pd
@@ -21,8 +24,11 @@ from matplotlib.lines import Line2D
 # set matplotlib settings
 rc('font', family='serif')
 rc('font', serif='Computer Modern Roman')
-rc('text', usetex=True)
-rc('text.latex', preamble=r"\usepackage[T1]{fontenc} \catcode`\_=12")
+# rendering text with LaTeX is slow, so it is only enabled for publication runs with PLOT_USE_LATEX=1
+if os.environ.get('PLOT_USE_LATEX') == '1':
+    rc('text', usetex=True)
+    rc('text.latex', preamble=r"\usepackage[T1]{fontenc} \catcode`\_=12")
+rc('pdf', compression=6)
 
 from pbt.database import ReadOnlyDatabase
 from pbt.utils.iterable import flatten_dict
@@ -52,6 +58,7 @@ evolver_colors = {
     'PBT-DE': 'tab:orange',
     'PBT-SHADE': 'tab:green',
     'PBT-LSHADE': 'tab:red'}
+evolver_legend_handles = [Line2D([0], [0], color=color, linewidth=2, label=evolver) for evolver, color in evolver_colors.items()]
 evolver_light_colors = {
     'PBT': 'lightblue',
     'PBT-DE': 'moccasin',
@@ -106,12 +113,15 @@ hyper_parameter_rename_dict = {
 def ylim_from_df(df: pd.DataFrame, is_increasing: bool, strength: float = 1.5, pad_top: float = 0.1, pad_bottom: float = 0.1) -> Tuple[float, float]:
     if df.empty:
         return
-    df = df.dropna(inplace=False, how='any')
+    values = df.to_numpy(dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return
     # calculate statistics
-    data_max = df.max()
-    data_min = df.min()
-    data_mean = df.values.mean()
-    data_std = df.values.std(ddof=1)
+    data_max = values.max()
+    data_min = values.min()
+    data_mean = values.mean()
+    data_std = values.std(ddof=1)
     # identify outliers
     cut_off = data_std * strength
     lower = data_mean - cut_off
@@ -121,36 +131,89 @@ def ylim_from_df(df: pd.DataFrame, is_increasing: bool, strength: float = 1.5, p
     else:
         return data_min + (data_min - upper) * pad_bottom, upper
 
+def best_member_uid(database_path: Path) -> str:
+    """Returns the uid of the best member in the database. The uid is indexed in a json-file, so the checkpoints are only loaded the first time."""
+    index_path = Path(database_path, 'results', 'best_uid.json')
+    if index_path.exists():
+        return json.loads(index_path.read_text())['uid']
+    database = ReadOnlyDatabase(database_path=database_path, read_function=torch.load)
+    best_uid = str(max(database.get_last()).uid)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(json.dumps({'uid': best_uid}))
+    return best_uid
+
+def create_task_dataframe(task_path: Path):
+    task = task_path.name
+    df_members = list()
+    print(f"Task: {task}")
+    directories = list(task_path.glob('*'))
+    for directory_index, directory in enumerate(directories):
+        evolver = directory.name.split("batch64_", 1)[1]
+        database_paths = list(directory.glob('*'))
+        for database_index, database_path in enumerate(database_paths, 1):
+            print(f"-- {task} ({directory_index*len(database_paths)+database_index}/{len(database_paths)*len(directories)}) {database_path}...")
+            best_uid = best_member_uid(database_path)
+            plot_folder = Path(database_path, 'results', 'plots')
+            dataframes = list()
+            csv_files = [Path(entry.path) for entry in os.scandir(plot_folder) if entry.name.endswith('.csv')]
+            for csv_file in csv_files:
+                # only parse the steps and the column of the best member
+                df_csv = pd.read_csv(csv_file, usecols=['steps', best_uid], index_col='steps')
+                series = df_csv[best_uid]
+                name = csv_file.stem.replace('_dots', '').replace('hp_optimizer_', '').replace('loss_', '')
+                dataframes.append(series.rename(name))
+            df_member = pd.concat(dataframes, axis=1, sort=False)
+            df_member[evolver_tag] = evolvers_rename_dict[evolver]
+            df_member['database'] = database_path.name
+            df_member.set_index(['database', evolver_tag], append=True, inplace=True)
+            df_member.sort_index(inplace=True)
+            df_members.append(df_member)
+    # concatenate once, appending to the result for each member copies it every time
+    df_result = pd.concat(df_members, axis=0, sort=False) if df_members else pd.DataFrame()
+    df_result.to_csv(Path(data_path, f"{task}.csv"))
+    # store a typed binary copy, which is what the plot and table functions read
+    df_result = df_result.reset_index()
+    if not df_result.empty:
+        df_result = as_categories(df_result)
+    df_result.to_pickle(Path(data_path, f"{task}.pkl"))
+
 def create_dataframes():
     directories = list(checkpoints_path.glob('*'))
-    num_tasks = len(directories)
     data_path.mkdir(parents=True, exist_ok=True)
-    for task_index, task_path in enumerate(directories, 1):
-        task = task_path.name
-        df_result = pd.DataFrame()
-        print(f"Task {task_index} of {num_tasks}: {task}")
-        directories = list(task_path.glob('*'))
-        for directory_index, directory in enumerate(directories):
-            evolver = directory.name.split("batch64_", 1)[1]
-            database_paths = list(directory.glob('*'))
-            for database_index, database_path in enumerate(database_paths, 1):
-                print(f"-- ({directory_index*len(database_paths)+database_index}/{len(database_paths)*len(directories)}) {database_path}...")
-                database = ReadOnlyDatabase(database_path=database_path, read_function=torch.load)
-                best = max(database.get_last())
-                plot_folder = Path(database_path, 'results', 'plots')
-                dataframes = list()
-                for csv_file in plot_folder.glob('*.csv'):
-                    df_csv = pd.read_csv(csv_file, index_col='steps')
-                    series = df_csv[str(best.uid)]
-                    name = csv_file.stem.replace('_dots', '').replace('hp_optimizer_', '').replace('loss_', '')
-                    dataframes.append(series.rename(name))
-                df_member = pd.concat(dataframes, axis=1, sort=False)
-                df_member[evolver_tag] = evolvers_rename_dict[evolver]
-                df_member['database'] = database_path.name
-                df_member.set_index(['database', evolver_tag], append=True, inplace=True)
-                df_member.sort_index(inplace=True)
-                df_result = df_result.append(df_member)
-        df_result.to_csv(Path(data_path, f"{task}.csv"))
+    # tasks are independent of each other and are processed in parallel
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count(), len(directories)) or 1) as executor:
+        list(executor.map(create_task_dataframe, directories))
+
+def task_data_paths() -> Sequence[Path]:
+    """Returns the paths of the task dataframes created by create_dataframes."""
+    return list(data_path.glob('*.pkl'))
+
+def as_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Encodes the evolver and database columns as categories, which makes grouping on them a lot faster."""
+    df[evolver_tag] = pd.Categorical(df[evolver_tag], categories=evolvers)
+    df['database'] = df['database'].astype('category')
+    return df
+
+def read_task_data(task_path: Path) -> pd.DataFrame:
+    """Reads a task dataframe without parsing the text of the corresponding csv-file."""
+    df = pd.read_pickle(task_path)
+    if df.empty:
+        return df
+    # single precision is plenty for plotting and halves the memory the reductions need to scan
+    float_columns = df.select_dtypes(include='float64').columns
+    df[float_columns] = df[float_columns].astype(np.float32)
+    df['steps'] = df['steps'].astype(np.int32)
+    return as_categories(df)
+
+@lru_cache(maxsize=None)
+def load_task_data(task_path: Path) -> pd.DataFrame:
+    """Reads a task dataframe and keeps the entries of the compared evolvers. The result is cached, as the tables and plots all read the same tasks."""
+    df = read_task_data(task_path)
+    return df[df[evolver_tag].isin(evolvers)] if not df.empty else df
+
+def last_per_database(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the last entry of each database."""
+    return df.loc[df.groupby('database', sort=False, observed=True)['steps'].idxmax()]
 
 def float_formatter(value: float):
     if value < 1.0:
@@ -165,42 +228,50 @@ def grouper(iterable, n, fillvalue=None):
     args = [iter(iterable)] * n
     return zip_longest(fillvalue=fillvalue, *args)
 
+table_stats = ['median', 'mean', 'std', 'min', 'max']
+
+def create_share(create_functions: Sequence[Callable], directories: Sequence[Path]):
+    """Calls each create function with the same share of the task dataframes, so the cached dataframes of the share are read once in the process."""
+    for create_function in create_functions:
+        create_function(directories=directories)
+
+def create_in_parallel(*create_functions):
+    """Splits the tasks between processes, where each process calls every create function with its share of the task dataframes."""
+    directories = task_data_paths()
+    n_processes = min(os.cpu_count(), len(directories)) or 1
+    shares = [directories[index::n_processes] for index in range(n_processes)]
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        futures = [executor.submit(create_share, create_functions, share) for share in shares]
+        for future in futures:
+            future.result()
+
 # TABLE: loss for train, eval and test across steps for pbt, de, shade, lshade on the average with std and min and max
 def create_table_df():
     table_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
-    dataframes = {csv_file.stem: pd.read_csv(csv_file) for csv_file in directories}
+    directories = task_data_paths()
+    dataframes = {task_path.stem: load_task_data(task_path) for task_path in directories}
+    task_stats = dict()
+    for task, df in dataframes.items():
+        if df.empty:
+            raise Exception(f"data on task {task} was empty")
+        dataset, model = tuple(task.split('_'))
+        # keep last entries for each
+        df_last = last_per_database(df)
+        # remove unwanted columns
+        score_df = df_last[metrics + [evolver_tag]]
+        # create statistics in a single pass over the groups
+        df_stats = score_df.groupby(evolver_tag, sort=False, observed=True).agg(table_stats)
+        # move the metrics to the index and split them into set and metric
+        df_stats = df_stats.stack(level=0)
+        keys = df_stats.index.get_level_values(1).str.split('_', expand=True)
+        df_stats.index = pd.MultiIndex.from_arrays(
+            [keys.get_level_values(0), keys.get_level_values(1), df_stats.index.get_level_values(0)],
+            names=['Set', 'metric', 'Algorithm'])
+        task_stats[dataset, model] = df_stats
+    df_stats = pd.concat(task_stats, names=['Dataset', 'Model'])
     for metric in single_metrics:
         multi_index = pd.MultiIndex.from_product([datasets, models, sets, evolvers], names=['Dataset', 'Model', 'Set', 'Algorithm'])
-        result_table_df = pd.DataFrame(columns=['median','mean', 'std', 'min', 'max'], index=multi_index)
-        for task_index, (task, df) in enumerate(dataframes.items(), 1):
-            if df.empty:
-                raise Exception(f"data on task {task} was empty")
-            dataset, model = tuple(task.split('_'))
-            # remove unwanted columns
-            df = df[df[evolver_tag].isin(evolvers)]
-            # keep last entries for each
-            index_of_last_entries = df.groupby(['database'])['steps'].transform(max) == df['steps']
-            df_last = df[index_of_last_entries]
-            # remove unwanted columns
-            score_df = df_last[metrics + [evolver_tag]]
-            # create statistics
-            df_median = score_df.groupby([evolver_tag]).median().transpose()
-            df_mean = score_df.groupby([evolver_tag]).mean().transpose()
-            df_std = score_df.groupby([evolver_tag]).std().transpose()
-            df_min = score_df.groupby([evolver_tag]).min().transpose()
-            df_max = score_df.groupby([evolver_tag]).max().transpose()
-            for stat_type, df_stat in {'median': df_median, 'mean': df_mean, 'std': df_std, 'min': df_min, 'max': df_max}.items():
-                df_stat.rename_axis('metric', inplace=True)
-                df_stat.reset_index(inplace=True)
-                df_key = pd.DataFrame(df_stat['metric'].str.split('_').tolist(), columns = ['set','metric'])
-                df_stat.drop(columns='metric', inplace=True)
-                df_stat = pd.concat([df_key, df_stat], axis=1)
-                df_stat.set_index(['set','metric'], inplace=True)
-                for evolver in evolvers:
-                    for s in sets:
-                        stat = df_stat.loc[s, metric][evolver]
-                        result_table_df.loc[dataset, model, s, evolver][stat_type] = stat
+        result_table_df = df_stats.xs(metric, level='metric').reindex(multi_index)[table_stats].astype(object)
         result_table_df.rename(index={
             'mnist': 'MNIST',
             'fashionmnist': r'\shortstack[l]{\textit{Fashion}\\MNIST}',
@@ -231,15 +302,23 @@ def create_table_df():
             caption=f"The peformance evaluation between {', '.join(evolvers[:-1])} and {evolvers[-1]}, measured in {printable_metrics[metric]}.",
             label=f"tab:{metric}_score_table")
 
-def plot_boxplot_figure(df: pd.DataFrame, group_by: str, groups: list, columns: Sequence[str], **kwargs):
+def plot_boxplot_figure(df: pd.DataFrame, group_by: str, groups: list, columns: Sequence[str], figure: plt.Figure = None, **kwargs):
     colors = mcolors.TABLEAU_COLORS
     # remove unwanted columns
     df = df[df[group_by].isin(groups)]
     # sort in correct group order
     df[group_by] = pd.Categorical(df[group_by], groups)
     df.sort_values(by=group_by, inplace=True)
-    # create figure
-    figure, axes = plt.subplots(**kwargs)
+    # create figure, or clear the axes of the provided figure to reuse it
+    if figure is None:
+        figure, axes = plt.subplots(layout='constrained', **kwargs)
+        figure.get_layout_engine().set(h_pad=0.04, w_pad=0.04)
+    else:
+        plt.figure(figure.number)
+        axes = np.reshape(figure.axes, (kwargs['nrows'], kwargs['ncols']))
+        for ax in axes.flat:
+            ax.cla()
+        figure.legends.clear()
     boxplots = df.boxplot(
         ax=axes, by=group_by, column=columns, vert=True, widths=0.5, return_type='both',
         showfliers=False, notch=False, patch_artist=False)
@@ -249,10 +328,9 @@ def plot_boxplot_figure(df: pd.DataFrame, group_by: str, groups: list, columns:
         # fill with colors
         for lines, color in zip(boxplot.lines['boxes'], itertools.cycle(colors)):
             lines.set_color(color)
-    # layout
-    figure.tight_layout(h_pad=0.8, w_pad=0.8)
+    # the constrained layout makes room for the legend below the axes when the figure is drawn
     figure.legend(
-        loc='lower center', ncol=len(groups), frameon=False,
+        loc='outside lower center', ncol=len(groups), frameon=False,
         handles=[
             mpatches.Patch(fill=False, edgecolor=color, label=category)
             for category, color in zip(groups, itertools.cycle(colors))])
@@ -261,17 +339,18 @@ def plot_boxplot_figure(df: pd.DataFrame, group_by: str, groups: list, columns:
     return figure
 
 # BOXPLOT: loss for train, eval and test across steps for pbt, de, shade, lshade on the average
-def create_box_plots():
-    directories = list(data_path.glob('*'))
+def create_box_plots(directories: Sequence[Path] = None):
+    directories = task_data_paths() if directories is None else directories
     box_plots_path.mkdir(parents=True, exist_ok=True)
     figure_height = 3
     columns = ['train_cce', 'eval_cce', 'test_cce', 'train_f1', 'eval_f1', 'test_f1', 'train_acc', 'eval_acc', 'test_acc']
+    # one figure for each evolver set, reused across tasks
+    figures = dict()
     for index, task_path in enumerate(directories):
         task = task_path.stem
         evolver_tag = 'evolver'
-        df = pd.read_csv(task_path)
-        index_of_last_entries = df.groupby(['database'])['steps'].transform(max) == df['steps']
-        df = df[index_of_last_entries]
+        df = load_task_data(task_path)
+        df = last_per_database(df)
         if df.empty:
             continue
         # create all vs all plot
@@ -281,62 +360,80 @@ def create_box_plots():
             print(f"-- ({index + 1} of {len(directories)}) creating plot for {file_name}...")
             figure_width = 4.8 + (DOCUMENT_MAX_COLUMN_WIDTH - 4.8) * ((i - 1) / (len(evolvers) - 2))
             figure = plot_boxplot_figure(
-                df=df, group_by=evolver_tag, groups=evolver_set, columns=columns,
+                df=df, group_by=evolver_tag, groups=evolver_set, columns=columns, figure=figures.get(i),
                 figsize=(figure_width, figure_height), nrows=len(single_metrics), ncols=len(sets), sharex=True)
+            figures[i] = figure
             figure.savefig(fname=Path(box_plots_path, f"{file_name}.png"), format='png', transparent=False)
             figure.savefig(fname=Path(box_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True)
-            figure.clf()
-            del figure
-            plt.close('all')
+    for figure in figures.values():
+        plt.close(figure)
 
 # PLOT: loss for train, eval and test across steps for pbt, de, shade, lshade on the median best example
-def create_line_plots(mode: str = 'mean'):
-    colors = mcolors.TABLEAU_COLORS
+def create_line_plots(mode: str = 'mean', directories: Sequence[Path] = None):
     figure_height = 8
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     line_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths() if directories is None else directories
+    # the layout is the same for every task, so the figure is created once and only the plot axes are cleared between tasks
+    figure = plt.figure(figsize=(figure_width, figure_height))
+    gs = figure.add_gridspec(nrows=4, ncols=1, hspace=0.2, height_ratios=[1]*3 + [0.3])
+    for index, metric in enumerate(single_metrics):
+        total_ax = figure.add_subplot(gs[index])
+        total_ax.axis('off')
+        total_ax.set_title(metric_rename_dict[metric])
+    axes = dict()
+    for group_index, metric_group in enumerate(metric_groups):
+        inner_gs = gridspec.GridSpecFromSubplotSpec(nrows=3, ncols=2, width_ratios=[1, 0.5], wspace=0.0, subplot_spec=gs[group_index])
+        for index, metric in enumerate(metric_group):
+            axes[group_index, index] = (figure.add_subplot(inner_gs[index, 0]), figure.add_subplot(inner_gs[index, 1]))
+    # create legends
+    ax_legend = figure.add_subplot(gs[-1])
+    ax_legend.axis('off')
+    ax_legend.legend(
+        loc='center', ncol=len(evolvers), frameon=False,
+        handles=evolver_legend_handles)
+    # add x axis label
+    figure.text(0.5, 0.070, 'steps', ha='center')
+    plt.subplots_adjust(top=0.95, bottom=0.00)
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df = df[df[evolver_tag].isin(evolvers)]
         if mode == 'best':
             # keep last entries for each
-            index_of_last_entries = df.groupby(['database'])['steps'].transform(max) == df['steps']
-            df_last = df[index_of_last_entries]
+            df_last = last_per_database(df)
             # keep best entries for each evolver
-            index_of_best_entries = df_last.groupby([evolver_tag])[eval_metric].transform(max) == df_last[eval_metric]
+            index_of_best_entries = df_last.groupby([evolver_tag], observed=True)[eval_metric].transform(max) == df_last[eval_metric]
             df_best = df_last[index_of_best_entries]
             # select all entries from best database
             df_plotable = df.loc[df['database'].isin(df_best['database'])]
         elif mode == 'mean':
-            df_plotable = df.groupby([evolver_tag, 'steps']).mean().reset_index()
+            df_plotable = df.groupby([evolver_tag, 'steps'], observed=True).mean(numeric_only=True).reset_index()
         else:
             raise NotImplementedError()
-        figure = plt.figure(figsize=(figure_width, figure_height))
-        gs = figure.add_gridspec(nrows=4, ncols=1, hspace=0.2, height_ratios=[1]*3 + [0.3])
+        # split the data by evolver once, instead of filtering it for every plot
+        evolver_frames = {evolver: df_group.sort_values('steps') for evolver, df_group in df_plotable.groupby(evolver_tag, sort=False, observed=True)}
+        evolver_steps = {evolver: df_group['steps'].to_numpy() for evolver, df_group in evolver_frames.items()}
         file_name = f"{task}_line"
-        for index, metric in enumerate(single_metrics):
-            total_ax = figure.add_subplot(gs[index])
-            total_ax.axis('off')
-            total_ax.set_title(metric_rename_dict[metric])
         for group_index, metric_group in enumerate(metric_groups):
-            inner_gs = gridspec.GridSpecFromSubplotSpec(nrows=3, ncols=2, width_ratios=[1, 0.5], wspace=0.0, subplot_spec=gs[group_index])
             for index, metric in enumerate(metric_group):
                 print(f"---- ({group_index * len(metric_groups) + index + 1} of {len(metrics)}) creating plot for {metric}...")
                 set_division, single_metric = tuple(metric.split('_'))
-                left_ax = figure.add_subplot(inner_gs[index, 0])
-                right_ax = figure.add_subplot(inner_gs[index, 1])
+                left_ax, right_ax = axes[group_index, index]
+                left_ax.cla()
+                right_ax.cla()
                 # plot
                 for evolver in evolvers:
-                    df_by_evolver = df_plotable.loc[df_plotable[evolver_tag] == evolver]
-                    df_by_evolver.plot(x='steps', y=metric, kind='line', legend=False, ax=left_ax, grid=False)
-                    df_by_evolver.plot(x='steps', y=metric, kind='line', legend=False, ax=right_ax, grid=False)
+                    df_by_evolver = evolver_frames.get(evolver)
+                    steps = evolver_steps.get(evolver)
+                    if df_by_evolver is None or steps is None:
+                        continue
+                    values = df_by_evolver[metric].to_numpy()
+                    left_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
+                    right_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
                 # draw grid
                 left_ax.grid('on', which='major', axis='both')
                 right_ax.grid('on', which='major', axis='both')
@@ -379,68 +476,68 @@ def create_line_plots(mode: str = 'mean'):
                 left_ax.yaxis.tick_left()
                 right_ax.yaxis.tick_right()
                 ticks = right_ax.xaxis.get_major_ticks()[0].label1.set_visible(False)
-        # create legends
-        ax_legend = figure.add_subplot(gs[-1])
-        ax_legend.axis('off')
-        ax_legend.legend(
-            loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=color, linewidth=2, label=evolver) for evolver, color in zip(evolvers, itertools.cycle(colors))])
-        # add x axis label
-        figure.text(0.5, 0.070, 'steps', ha='center')
-        plt.subplots_adjust(top=0.95, bottom=0.00)
         # save figure
-        figure.savefig(fname=Path(line_plots_path, f"{file_name}.png"), format='png', transparent=False)
-        figure.savefig(fname=Path(line_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True)
-        figure.clf()
-        del figure
-        plt.close('all')
+        figure.savefig(fname=Path(line_plots_path, f"{file_name}.png"), format='png', transparent=False, pil_kwargs={'compress_level': 1})
+        figure.savefig(fname=Path(line_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True, dpi=200, metadata={'CreationDate': None})
+    plt.close(figure)
 
 # sum of all member time spent each step for pbt, de, shade and lshade
-def create_time_line_plots():
-    colors = mcolors.TABLEAU_COLORS
+def create_time_line_plots(directories: Sequence[Path] = None):
     figure_height = 5
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     time_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths() if directories is None else directories
+    time_columns = time_keys + ['time_sum']
+    # the layout is the same for every task, so the figure is created once and only the plot axes are cleared between tasks
+    figure = plt.figure(figsize=(figure_width, figure_height))
+    gs = figure.add_gridspec(
+        nrows=len(time_columns) + 1, ncols=2,
+        width_ratios=[1, 0.5], wspace=0.0,
+        height_ratios=[1]*len(time_columns) + [0.5])
+    axes = dict()
+    for time_index, time_type in enumerate(time_columns):
+        axes[time_index] = (figure.add_subplot(gs[time_index, 0]), figure.add_subplot(gs[time_index, 1]))
+    # create legends
+    ax_legend = figure.add_subplot(gs[len(time_columns), :])
+    ax_legend.axis('off')
+    ax_legend.legend(
+        loc='center', ncol=len(evolvers), frameon=False,
+        handles=evolver_legend_handles)
+    # add x axis label
+    figure.text(0.5, 0.1, 'steps', ha='center')
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df = df[df[evolver_tag].isin(evolvers)]
-        df_plotable = df.groupby([evolver_tag, 'steps']).mean().reset_index()
+        df_plotable = df.groupby([evolver_tag, 'steps'], observed=True).mean(numeric_only=True).reset_index()
         df_plotable['time_sum'] = df_plotable[time_keys].sum(axis=1)
+        # split the data by evolver once, instead of filtering it for every plot
+        evolver_frames = {evolver: df_group.sort_values('steps') for evolver, df_group in df_plotable.groupby(evolver_tag, sort=False, observed=True)}
+        evolver_steps = {evolver: df_group['steps'].to_numpy() for evolver, df_group in evolver_frames.items()}
         file_name = f"{task}_time_line"
-        figure = plt.figure(figsize=(figure_width, figure_height))
-        time_columns = time_keys + ['time_sum']
-        gs = figure.add_gridspec(
-            nrows=len(time_columns) + 1, ncols=2,
-            width_ratios=[1, 0.5], wspace=0.0,
-            height_ratios=[1]*len(time_columns) + [0.5])
         for time_index, time_type in enumerate(time_columns):
             print(f"---- ({time_index + 1} of {len(time_columns)}) creating plot for '{time_type}'...")
-            left_ax = figure.add_subplot(gs[time_index, 0])
-            right_ax = figure.add_subplot(gs[time_index, 1])
+            left_ax, right_ax = axes[time_index]
+            left_ax.cla()
+            right_ax.cla()
             # plot
             for evolver in evolvers:
-                df_by_evolver = df_plotable.loc[df_plotable[evolver_tag] == evolver]
-                df_by_evolver.plot(x='steps', y=time_type, kind='line', legend=False, ax=left_ax, grid=False)
-                df_by_evolver.plot(x='steps', y=time_type, kind='line', legend=False, ax=right_ax, grid=False)
+                df_by_evolver = evolver_frames.get(evolver)
+                steps = evolver_steps.get(evolver)
+                if df_by_evolver is None or steps is None:
+                    continue
+                values = df_by_evolver[time_type].to_numpy()
+                left_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
+                right_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
             # draw grid
             left_ax.grid('on', which='major', axis='both')
             right_ax.grid('on', which='major', axis='both')
             # set ax title
-            ax_title = figure.add_subplot(gs[time_index, :])
-            ax_title.axis('off')
-            left_ax.set_title('')
-            right_ax.set_title('')
-            if time_type != 'time_sum':
-                ax_title.set_title(f"average {time_rename_dict[time_type]} for each member (in seconds)")
-            else:
-                ax_title.set_title(f"average total generation time for each member (in seconds)")
+            time_name = time_rename_dict[time_type] if time_type != 'time_sum' else 'total generation time'
+            left_ax.set_title(f"average {time_name} for each member (in seconds)", loc='left', pad=4)
             # remove x axis labels
             left_ax.set_xlabel('')
             right_ax.set_xlabel('')
@@ -460,71 +557,78 @@ def create_time_line_plots():
             left_ax.yaxis.tick_left()
             right_ax.yaxis.tick_right()
             ticks = right_ax.xaxis.get_major_ticks()[0].label1.set_visible(False)
-        # create legends
-        ax_legend = figure.add_subplot(gs[len(time_columns), :])
-        ax_legend.axis('off')
-        ax_legend.legend(
-            loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=color, linewidth=2, label=evolver) for evolver, color in zip(evolvers, itertools.cycle(colors))])
         # set figure layout
         figure.tight_layout(h_pad=0.8, w_pad=0.0)
-        # add x axis label
-        figure.text(0.5, 0.1, 'steps', ha='center')
         # save figure
-        figure.savefig(fname=Path(time_plots_path, f"{file_name}.png"), format='png', transparent=False)
-        figure.savefig(fname=Path(time_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True)
-        figure.clf()
-        del figure
-        plt.close('all')
+        figure.savefig(fname=Path(time_plots_path, f"{file_name}.png"), format='png', transparent=False, pil_kwargs={'compress_level': 1})
+        figure.savefig(fname=Path(time_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True, dpi=200, metadata={'CreationDate': None})
+    plt.close(figure)
 
 # table of total execution time for pbt, de, shade and lshade
 
 # PLOT: loss for train, eval and test across steps for pbt, de, shade, lshade on the median best example
-def create_hp_plots(mode: str = 'mean'):
-    colors = mcolors.TABLEAU_COLORS
+def create_hp_plots(mode: str = 'mean', directories: Sequence[Path] = None):
     figure_height = 6
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     hp_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths() if directories is None else directories
+    # the layout is the same for every task, so the figure is created once and only the plot axes are cleared between tasks
+    figure = plt.figure(figsize=(figure_width, figure_height))
+    gs = figure.add_gridspec(nrows=4, ncols=2, hspace=0.4, wspace=0.0, width_ratios=[1.0, 0.5], height_ratios=[1]*3 + [0.3])
+    axes = dict()
+    for index, hyper_parameter in enumerate(hyper_parameters):
+        # set title
+        total_ax = figure.add_subplot(gs[index, :])
+        total_ax.axis('off')
+        total_ax.set_title(hyper_parameter_rename_dict[hyper_parameter])
+        # define plottable axes
+        axes[index] = (figure.add_subplot(gs[index, 0]), figure.add_subplot(gs[index, 1]))
+    # create legends
+    ax_legend = figure.add_subplot(gs[-1, :])
+    ax_legend.axis('off')
+    ax_legend.legend(
+        loc='center', ncol=len(evolvers), frameon=False,
+        handles=evolver_legend_handles)
+    # add x axis label
+    figure.text(0.5, 0.070, 'steps', ha='center')
+    plt.subplots_adjust(top=0.95, bottom=0.00)
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df = df[df[evolver_tag].isin(evolvers)]
         if mode == 'best':
             # keep last entries for each
-            index_of_last_entries = df.groupby(['database'])['steps'].transform(max) == df['steps']
-            df_last = df[index_of_last_entries]
+            df_last = last_per_database(df)
             # keep best entries for each evolver
-            index_of_best_entries = df_last.groupby([evolver_tag])[eval_metric].transform(max) == df_last[eval_metric]
+            index_of_best_entries = df_last.groupby([evolver_tag], observed=True)[eval_metric].transform(max) == df_last[eval_metric]
             df_best = df_last[index_of_best_entries]
             # select all entries from best database
             df_plotable = df.loc[df['database'].isin(df_best['database'])]
         elif mode == 'mean':
-            df_plotable = df.groupby([evolver_tag, 'steps']).mean().reset_index()
+            df_plotable = df.groupby([evolver_tag, 'steps'], observed=True).mean(numeric_only=True).reset_index()
         else:
             raise NotImplementedError()
-        figure = plt.figure(figsize=(figure_width, figure_height))
-        gs = figure.add_gridspec(nrows=4, ncols=2, hspace=0.4, wspace=0.0, width_ratios=[1.0, 0.5], height_ratios=[1]*3 + [0.3])
+        # split the data by evolver once, instead of filtering it for every plot
+        evolver_frames = {evolver: df_group.sort_values('steps') for evolver, df_group in df_plotable.groupby(evolver_tag, sort=False, observed=True)}
+        evolver_steps = {evolver: df_group['steps'].to_numpy() for evolver, df_group in evolver_frames.items()}
         file_name = f"{task}_hp"
         for index, hyper_parameter in enumerate(hyper_parameters):
             print(f"---- ({index + 1} of {len(hyper_parameters)}) creating plot for '{hyper_parameter}'...")
-            # set title
-            total_ax = figure.add_subplot(gs[index, :])
-            total_ax.axis('off')
-            total_ax.set_title(hyper_parameter_rename_dict[hyper_parameter])
-            # define plottable axes
-            left_ax = figure.add_subplot(gs[index, 0])
-            right_ax = figure.add_subplot(gs[index, 1])
+            left_ax, right_ax = axes[index]
+            left_ax.cla()
+            right_ax.cla()
             # plot
             for evolver in evolvers:
-                df_by_evolver = df_plotable.loc[df_plotable[evolver_tag] == evolver]
-                df_by_evolver.plot(x='steps', y=hyper_parameter, kind='line', legend=False, ax=left_ax, grid=False)
-                df_by_evolver.plot(x='steps', y=hyper_parameter, kind='line', legend=False, ax=right_ax, grid=False)
+                df_by_evolver = evolver_frames.get(evolver)
+                steps = evolver_steps.get(evolver)
+                if df_by_evolver is None or steps is None:
+                    continue
+                values = df_by_evolver[hyper_parameter].to_numpy()
+                left_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
+                right_ax.plot(steps, values, color=evolver_colors[evolver], rasterized=True)
             # draw grid
             left_ax.grid('on', which='major', axis='both')
             right_ax.grid('on', which='major', axis='both')
@@ -555,21 +659,10 @@ def create_hp_plots(mode: str = 'mean'):
             left_ax.yaxis.tick_left()
             right_ax.yaxis.tick_right()
             ticks = right_ax.xaxis.get_major_ticks()[0].label1.set_visible(False)
-        # create legends
-        ax_legend = figure.add_subplot(gs[-1, :])
-        ax_legend.axis('off')
-        ax_legend.legend(
-            loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=color, linewidth=2, label=evolver) for evolver, color in zip(evolvers, itertools.cycle(colors))])
-        # add x axis label
-        figure.text(0.5, 0.070, 'steps', ha='center')
-        plt.subplots_adjust(top=0.95, bottom=0.00)
         # save figure
-        figure.savefig(fname=Path(hp_plots_path, f"{file_name}.png"), format='png', transparent=False)
-        figure.savefig(fname=Path(hp_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True)
-        figure.clf()
-        del figure
-        plt.close('all')
+        figure.savefig(fname=Path(hp_plots_path, f"{file_name}.png"), format='png', transparent=False, pil_kwargs={'compress_level': 1})
+        figure.savefig(fname=Path(hp_plots_path, f"{file_name}.pdf"), format='pdf', transparent=True, dpi=200, metadata={'CreationDate': None})
+    plt.close(figure)
 
 def create_hp_trend_plots():
     FILL_COLOR = 'gainsboro'
@@ -578,16 +671,15 @@ def create_hp_trend_plots():
     figure_height = 5
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     hp_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths()
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df_plotable = df[df[evolver_tag].isin(evolvers)]
+        df_plotable = df
         # create figure
         figure = plt.figure(figsize=(figure_width, figure_height))
         gs = figure.add_gridspec(nrows=len(evolvers) + 1, ncols=len(hyper_parameters), wspace=0.1, hspace=0.3, height_ratios=[1.0]*len(evolvers) + [0.35])
@@ -683,7 +775,7 @@ def create_hp_trend_plots():
         ax_legend.axis('off')
         ax_legend.legend(
             loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=evolver_colors[evolver], linewidth=2, label=evolver) for evolver in evolvers])
+            handles=evolver_legend_handles)
         # add x axis label
         gs.tight_layout(figure=figure, rect=(0.0, 0.0, 1.0, 1.0))
         figure.text(0.5, 0.090, 'steps', ha='center')
@@ -702,16 +794,15 @@ def create_hp_trend_v2_plots():
     figure_height = 9.0
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     hp_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths()
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df_plotable = df[df[evolver_tag].isin(evolvers)]
+        df_plotable = df
         # create figure
         figure = plt.figure(figsize=(figure_width, figure_height))
         gs = figure.add_gridspec(nrows=len(hyper_parameters) + 1, ncols=1, wspace=0.1, hspace=0.2, height_ratios=[1.0]*len(hyper_parameters) + [0.15])
@@ -795,7 +886,7 @@ def create_hp_trend_v2_plots():
         ax_legend.axis('off')
         ax_legend.legend(
             loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=evolver_colors[evolver], linewidth=2, label=evolver) for evolver in evolvers])
+            handles=evolver_legend_handles)
         # add x axis label
         gs.tight_layout(figure=figure, rect=(0.0, 0.0, 1.0, 1.0))
         figure.text(0.5, 0.090, 'steps', ha='center')
@@ -814,16 +905,15 @@ def create_hp_trend_matrix_plots():
     figure_height = 5
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     hp_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths()
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df_plotable = df[df[evolver_tag].isin(evolvers)]
+        df_plotable = df
         # create figure
         figure = plt.figure(figsize=(figure_width, figure_height))
         gs = figure.add_gridspec(nrows=len(evolvers) + 1, ncols=len(hyper_parameters), wspace=0.1, hspace=0.3, height_ratios=[1.0]*len(evolvers) + [0.35])
@@ -911,7 +1001,7 @@ def create_hp_trend_matrix_plots():
         ax_legend.axis('off')
         ax_legend.legend(
             loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=evolver_colors[evolver], linewidth=2, label=evolver) for evolver in evolvers])
+            handles=evolver_legend_handles)
         # add x axis label
         gs.tight_layout(figure=figure, rect=(0.0, 0.0, 1.0, 1.0))
         figure.text(0.5, 0.090, 'steps', ha='center')
@@ -937,16 +1027,15 @@ def create_hp_trend_plots_3D():
     figure_height = 8
     figure_width = DOCUMENT_MAX_COLUMN_WIDTH
     hp_plots_path.mkdir(parents=True, exist_ok=True)
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths()
     for task_index, task_path in enumerate(directories, 1):
         task = task_path.stem
         print(f"-- ({task_index} of {len(directories)}) creating plot for {task}...")
         # read data
-        df = pd.read_csv(task_path)
+        df = load_task_data(task_path)
         if df.empty:
             raise Exception(f"data on path {task_path} was empty")
-        # remove unwanted columns
-        df_plotable = df[df[evolver_tag].isin(evolvers)]
+        df_plotable = df
         # create figure
         figure = plt.figure(figsize=(figure_width, figure_height))
         gs = figure.add_gridspec(nrows=len(evolvers) + 1, ncols=len(hyper_parameters), wspace=0.1, hspace=0.3, height_ratios=[1.0]*len(evolvers) + [0.35])
@@ -1002,7 +1091,7 @@ def create_hp_trend_plots_3D():
         ax_legend.axis('off')
         ax_legend.legend(
             loc='center', ncol=len(evolvers), frameon=False,
-            handles=[Line2D([0], [0], color=evolver_colors[evolver], linewidth=2, label=evolver) for evolver in evolvers])
+            handles=evolver_legend_handles)
         # add x axis label
         gs.tight_layout(figure=figure, rect=(0.0, 0.0, 1.0, 1.0))
         figure.text(0.5, 0.090, 'steps', ha='center')
@@ -1016,7 +1105,7 @@ def create_hp_trend_plots_3D():
 
 def create_bar_summary_plot():
     colors = mcolors.TABLEAU_COLORS
-    directories = list(data_path.glob('*'))
+    directories = task_data_paths()
     directories.reverse()
     bar_plots_path.mkdir(parents=True, exist_ok=True)
     figure_height = 3.5
@@ -1029,9 +1118,8 @@ def create_bar_summary_plot():
         # create figure
         ax = figure.add_subplot(inner_gs)
         ax.set_title(f"{datasets_rename_dict[dataset]} w/ {models_rename_dict[model]}")
-        df = pd.read_csv(task_path)
-        index_of_last_entries = df.groupby(['database'])['steps'].transform(max) == df['steps']
-        df = df[index_of_last_entries]
+        df = load_task_data(task_path)
+        df = last_per_database(df)
         df = df[['evolver', 'test_f1']]
         if df.empty:
             continue
@@ -1039,9 +1127,9 @@ def create_bar_summary_plot():
         df[evolver_tag] = pd.Categorical(df[evolver_tag], evolvers)
         df.sort_values(by=evolver_tag, inplace=True)
         # get statistics
-        df_min = df.groupby([evolver_tag]).min().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'min'})
-        df_mean = df.groupby([evolver_tag]).mean().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'mean'})
-        df_max = df.groupby([evolver_tag]).max().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'max'})
+        df_min = df.groupby([evolver_tag], observed=True).min().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'min'})
+        df_mean = df.groupby([evolver_tag], observed=True).mean().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'mean'})
+        df_max = df.groupby([evolver_tag], observed=True).max().dropna().reset_index().set_index(evolver_tag).rename(columns={'test_f1': 'max'})
         df_plottable = pd.concat([df_min, df_mean, df_max], axis=1, sort=False)
         # plot
         ax = df_plottable.plot.bar(ax=ax, rot=0.0, legend=False, width=0.6, ylim=(df_plottable.min().min() - 0.005, df_plottable.max().max() + 0.003))
@@ -1074,10 +1162,7 @@ def create_bar_summary_plot():
 if __name__ == "__main__":
     create_dataframes()
     create_table_df()
-    create_box_plots()
-    create_line_plots()
-    create_time_line_plots()
-    create_hp_plots('mean')
+    create_in_parallel(create_box_plots, create_line_plots, create_time_line_plots, partial(create_hp_plots, mode='mean'))
     create_hp_trend_plots()
     create_hp_trend_v2_plots()
     create_hp_trend_matrix_plots()
@@ -86,9 +86,15 @@ def import_user_arguments():
     return args
 
 if __name__ == "__main__":
+    args = import_user_arguments()
     # set multiprocessing settings
     torch.multiprocessing.set_sharing_strategy('file_system')
-    torch.multiprocessing.set_start_method('spawn')
+    # CUDA requires spawned workers, while CPU workers are forked from a server process that has imported torch once
+    if all(device == 'cpu' for device in args.devices) and 'forkserver' in torch.multiprocessing.get_all_start_methods():
+        torch.multiprocessing.set_start_method('forkserver')
+        torch.multiprocessing.set_forkserver_preload(['torch', 'numpy', 'pbt.member', 'pbt.worker'])
+    else:
+        torch.multiprocessing.set_start_method('spawn')
     # set random seed
     random.seed(0)
     np.random.seed(0)
@@ -100,6 +106,5 @@ if __name__ == "__main__":
     torch.backends.cudnn.benchmark = False
     torch.backends.cudnn.enabled = True
 
-    args = import_user_arguments()
     validate_arguments(args)
     run(**vars(args))
\ No newline at end of file
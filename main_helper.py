@@ -13,6 +13,7 @@ from pbt.controller import Controller
 from pbt.task import mnist, emnist, fashionmnist
 from pbt.analyze import Analyzer
 from pbt.database import Database
+from pbt.member import Checkpoint
 from pbt.nn import Evaluator
 from pbt.fitness import RandomFitnessApproximation
 
@@ -217,7 +218,8 @@ def run(
     print(f"Preparing database...")
     database = Database(
         directory_path=f"{directory}/{task}/p{population_size}_train{train_steps}_fitness{fitness_steps}_batch{batch_size}_{evolver}",
-        read_function=torch.load, write_function=torch.save)
+        read_function=torch.load, write_function=torch.save, aggregate_entries=True,
+        header_function=Checkpoint.header)
     # prepare tensorboard writer
     tensorboard_writer = None
     if tensorboard:
@@ -295,7 +297,7 @@ def run(
     best = controller.start()
     # analyze results stored in database
     print("Analyzing population...")
-    analyzer = Analyzer(database, verbose=True)
+    analyzer = Analyzer(database, verbose=True, n_jobs=n_jobs)
     tester = Evaluator(
         model_class=_task.model_class, test_data=_task.datasets.test,
         loss_functions=_task.loss_functions, batch_size=batch_size,
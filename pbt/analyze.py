@@ -1,13 +1,15 @@
 import csv
-from functools import partial
+from collections import defaultdict
+from functools import partial, cached_property
 from pathlib import Path
-from statistics import stdev, mean
+from concurrent.futures import ProcessPoolExecutor
 from scipy import stats
 
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.colors
+from matplotlib.backends.backend_pdf import PdfPages
 
 from pbt.database import ReadOnlyDatabase
 from pbt.nn import Evaluator
@@ -24,12 +26,14 @@ def remove_outliers_from_dataframe(df, stdev_proximity = 3):
 def ylim_from_df(df, strength = 1.5):
     if df.empty:
         return
-    df = df.dropna(axis=1, inplace=False, how='any')
+    values = complete_columns(df)
+    if values.size < 2 or np.ptp(values) == 0:
+        return
     # calculate statistics
-    data_max = df.max().max()
-    data_min = df.min().min()
-    data_mean = df.values.mean()
-    data_std = df.values.std(ddof=1)
+    data_max = values.max()
+    data_min = values.min()
+    data_mean = values.mean()
+    data_std = values.std(ddof=1)
     # identify outliers
     cut_off = data_std * strength
     lower = data_mean - cut_off
@@ -39,20 +43,81 @@ def ylim_from_df(df, strength = 1.5):
     else:
         return data_min + (data_min - upper) * 0.1, upper
 
+def complete_columns(df):
+    """Returns the values of the columns without missing values as a float array."""
+    values = df.to_numpy(dtype=np.float64)
+    return values[:, ~np.isnan(values).any(axis=0)]
+
 def is_increasing(df, order=1):
-    df_no_nan = df.dropna(inplace=False, axis=1, how='any')
-    slopes = df_no_nan.apply(lambda x: np.polyfit(df.index, x, 1)[0])
-    mean = slopes.values.mean()
+    values = complete_columns(df)
+    # fit all columns at once, the first row holds the slopes
+    slopes = np.polyfit(df.index.to_numpy(dtype=np.float64), values, 1)[0]
+    mean = slopes.mean()
     return mean >= 0
 
-def save_figure_to_files(figure, directory, filename: str):
-    figure.savefig(fname=Path(directory, f"{filename}.png"), format='png', transparent=False)
-    figure.savefig(fname=Path(directory, f"{filename}.pdf"), format='pdf', transparent=True)
+def save_figure_to_files(figure, directory, filename: str, rasterized_dpi: int = 150, pdf: PdfPages = None, save_png: bool = True):
+    if save_png:
+        figure.savefig(fname=Path(directory, f"{filename}.png"), format='png', transparent=False)
+    # artists marked as rasterized are embedded as a single image with the given resolution
+    if pdf is not None:
+        pdf.savefig(figure, transparent=True, dpi=rasterized_dpi)
+    else:
+        figure.savefig(fname=Path(directory, f"{filename}.pdf"), format='pdf', transparent=True, dpi=rasterized_dpi)
+
+def plot_hyper_parameter_lines(param_name: str, df, best_member_id, directory, prefix: str = None, suffix: str = None, figsize: tuple = (10,2), save_csv: bool = False, save_png: bool = False):
+    # set colors
+    FILL_COLOR = 'gainsboro'
+    MEAN_COLOR = 'gray'
+    HIGHLIGHT_COLOR = 'darkcyan'
+    NAN_COLOR = 'crimson'
+    # set markers
+    DEFAULT_LINE_SIZE = 2
+    HIGHLIGHT_LINE_SIZE = 2
+    NAN_MARKER_SIZE=6
+    HIGHLIGHT_MARKER='s'
+    NAN_MARKER='x'
+    # create figure
+    fig, ax = plt.subplots(figsize = figsize, sharex = True)
+    ax.set_title(param_name)
+    ax.set_xlabel("steps")
+    ax.set_ylabel("value")
+    # plot fill
+    ax.fill_between(df.index, y1=df.min(axis=1), y2=df.max(axis=1), color=FILL_COLOR)
+    # plot lines
+    df.plot(ax=ax, legend=False, kind='line', ls='solid', solid_capstyle='round', linewidth=DEFAULT_LINE_SIZE, color=HIGHLIGHT_COLOR, alpha=0.2)
+    df.mean(axis=1).plot(ax=ax, legend=True, kind='line', ls='solid', linewidth=DEFAULT_LINE_SIZE, color=MEAN_COLOR, label='mean')
+    # plot best
+    hp_df_with_best=df[best_member_id]
+    hp_df_with_best.plot(ax=ax, legend=True, kind='line', ls='solid', linewidth=HIGHLIGHT_LINE_SIZE, color=HIGHLIGHT_COLOR, marker=HIGHLIGHT_MARKER, ms=6, label='best')
+    # plot end points
+    nan_df = pd.DataFrame()
+    for column_name in df.loc[:, df.isna().any()]:
+        index = df[column_name].last_valid_index()
+        nan_df.at[index, 'end'] = df.at[index,column_name]
+    if not nan_df.empty:
+        nan_df.plot(ax=ax, legend=True, kind='line', ls='none', marker=NAN_MARKER, ms=NAN_MARKER_SIZE, color=NAN_COLOR)
+    # save raster figure to directory
+    param_formatted = param_name.replace('/', '_')
+    filename = '_'.join(filter(None, [prefix, param_formatted, suffix]))
+    if save_png:
+        fig.savefig(fname=Path(directory, f"{filename}.png"), format='png', transparent=False)
+    # save dataframe to csv-file
+    if save_csv:
+        df.to_csv(Path(directory, f"{filename}.csv"))
+    # the figure is returned to be added to the plot document of the caller
+    plt.close(fig)
+    return fig
 
 class Analyzer(object):
-    def __init__(self, database: ReadOnlyDatabase, verbose: bool = False):
+    def __init__(self, database: ReadOnlyDatabase, verbose: bool = False, n_jobs: int = 1):
         self.database: ReadOnlyDatabase = database
         self.verbose = verbose
+        self.n_jobs = n_jobs
+
+    @cached_property
+    def all_entries(self) -> dict:
+        """ Returns the uid/steps/entry dictionary of the database. The database is only traversed once. """
+        return self.database.to_dict()
 
     def __print(self, message: str):
         if self.verbose:
@@ -67,7 +132,12 @@ class Analyzer(object):
         yield from self.database.get_last()
 
     def __get_best_member(self) -> Checkpoint:
-        return max(self.database.get_last())
+        # compare the headers of the last entries, and only read the best entry
+        headers = list(self.database.get_last_headers())
+        if not headers:
+            return max(self.database.get_last())
+        best = max(headers)
+        return self.database.entry(best.uid, best.steps)
 
     def __get_worst_member(self) -> Checkpoint:
         return min(self.database.get_last())
@@ -85,111 +155,116 @@ class Analyzer(object):
         return best
 
     def create_statistics(self, save_directory):
-        population_entries = self.database.to_dict()
+        population_entries = self.all_entries
         # get member statistics
         checkpoint_summaries = dict()
         for entry_id, entries in population_entries.items():
             entries = entries.values()
-            checkpoint_summaries[entry_id] = dict()
-            summary = checkpoint_summaries[entry_id]
-            summary['num_entries'] = len(entries)
+            # collect the values of each time and loss type across all entries
+            time_values = defaultdict(list)
+            loss_values = defaultdict(list)
             for checkpoint in entries:
-                for time_type, time_value in checkpoint.time.items():
-                    max_key = f"time_{time_type}_max"
-                    min_key = f"time_{time_type}_min"
-                    avg_key = f"time_{time_type}_avg"
-                    total_key = f"time_{time_type}_total"
-                    if max_key not in summary or time_value > summary[max_key]:
-                        summary[max_key] = time_value
-                    if min_key not in summary or time_value < summary[min_key]:
-                        summary[min_key] = time_value
-                    if avg_key not in summary:
-                        summary[avg_key] = time_value / summary['num_entries']
-                    else:
-                        summary[avg_key] += time_value / summary['num_entries']
-                    if total_key not in summary:
-                        summary[total_key] = time_value
-                    else:
-                        summary[total_key] += time_value
-                for loss_group, loss_values in checkpoint.loss.items():
-                    for loss_type, loss_value in loss_values.items():
-                        max_key = f"loss_{loss_group}_{loss_type}_max"
-                        min_key = f"loss_{loss_group}_{loss_type}_min"
-                        avg_key = f"loss_{loss_group}_{loss_type}_avg"
-                        if max_key not in summary or loss_value > summary[max_key]:
-                            summary[max_key] = loss_value
-                        if min_key not in summary or loss_value < summary[min_key]:
-                            summary[min_key] = loss_value
-                        if avg_key not in summary:
-                            summary[avg_key] = loss_value / summary['num_entries']
-                        else:
-                            summary[avg_key] += loss_value / summary['num_entries']
+                for time_type, time_value in flatten_dict(checkpoint.time, delimiter='_').items():
+                    time_values[f"time_{time_type}"].append(time_value)
+                for loss_type, loss_value in flatten_dict(checkpoint.loss, delimiter='_').items():
+                    loss_values[f"loss_{loss_type}"].append(loss_value)
+            # summarize the collected values
+            summary = dict()
+            summary['num_entries'] = len(entries)
+            for tag, values in time_values.items():
+                values = np.fromiter(values, dtype=np.float64, count=len(values))
+                summary[f"{tag}_max"] = values.max()
+                summary[f"{tag}_min"] = values.min()
+                summary[f"{tag}_avg"] = values.mean()
+                summary[f"{tag}_total"] = values.sum()
+            for tag, values in loss_values.items():
+                values = np.fromiter(values, dtype=np.float64, count=len(values))
+                summary[f"{tag}_max"] = values.max()
+                summary[f"{tag}_min"] = values.min()
+                summary[f"{tag}_avg"] = values.mean()
+            checkpoint_summaries[entry_id] = summary
         # save/print member statistics
         for entry_id, checkpoint_summary in checkpoint_summaries.items():
-            with open(f"{save_directory}/{entry_id}_statistics.txt", "a+") as file:
-                for tag, statistic in checkpoint_summary.items():
-                    info = f"{tag}: {statistic}"
-                    file.write(info + "\n")
+            lines = [f"{tag}: {statistic}" for tag, statistic in checkpoint_summary.items()]
+            Path(save_directory, f"{entry_id}_statistics.txt").write_text("\n".join(lines) + "\n")
 
     def __create_score_dataframe(self):
-        # create data holders
-        score_dataframe = pd.DataFrame()
-        # aquire plot data
-        for entry_id, entries in self.database.to_dict().items():
+        # aquire plot data as flat arrays
+        entry_ids, steps, scores = list(), list(), list()
+        for entry_id, entries in self.all_entries.items():
             for step, entry in entries.items():
-                score_dataframe.at[step, entry_id] = entry.test_score()
-        score_dataframe.index.name = "steps"
-        score_dataframe.sort_index(inplace=True)
+                entry_ids.append(entry_id)
+                steps.append(step)
+                scores.append(entry.test_score())
+        # scatter the scores into a steps x members table
+        step_values, step_indices = np.unique(np.array(steps), return_inverse=True)
+        member_indices, member_values = pd.factorize(pd.Index(entry_ids, dtype=object))
+        table = np.full((len(step_values), len(member_values)), np.nan)
+        table[step_indices, member_indices] = np.array(scores, dtype=np.float64)
+        score_dataframe = pd.DataFrame(table, index=pd.Index(step_values, name="steps"), columns=member_values)
         return score_dataframe
 
-    def __create_loss_dataframes(self):
-        # create data holders
-        loss_dataframes = dict()
-        # aquire plot data
-        for entry_id, entries in self.database.to_dict().items():
+    def __best_and_worst_member_ids(self, score_df):
+        """Returns the ids of the best and worst members at the last step."""
+        last_scores = score_df.to_numpy()[-1]
+        if self.__minimize_score():
+            best_index, worst_index = np.nanargmin(last_scores), np.nanargmax(last_scores)
+        else:
+            best_index, worst_index = np.nanargmax(last_scores), np.nanargmin(last_scores)
+        return score_df.columns[best_index], score_df.columns[worst_index]
+
+    @cached_property
+    def metric_records(self) -> pd.DataFrame:
+        """ Returns a flat table with the id, steps, group, metric and value of every loss and time of the entries in the database. """
+        records = list()
+        for entry_id, entries in self.all_entries.items():
             for step, entry in entries.items():
                 for metric_type, metric_value in flatten_dict(entry.loss, delimiter ='_').items():
-                    if metric_type not in loss_dataframes:
-                        loss_dataframes[metric_type] = pd.DataFrame()
-                    loss_dataframes[metric_type].at[step, entry_id] = metric_value
-        for df in loss_dataframes.values():
-            df.index.name = "steps"
+                    records.append((entry_id, step, 'loss', metric_type, metric_value))
+                for time_group, time_value in flatten_dict(entry.time, delimiter ='_').items():
+                    records.append((entry_id, step, 'time', time_group, time_value))
+        return pd.DataFrame.from_records(records, columns=['id', 'steps', 'group', 'metric', 'value'])
+
+    def __create_metric_dataframes(self, group: str):
+        records = self.metric_records
+        records = records[records['group'] == group]
+        metric_dataframes = dict()
+        for metric_type, metric_records in records.groupby('metric', sort=False):
+            # one column per member, in the order the members were read
+            df = metric_records.pivot(index='steps', columns='id', values='value')
+            df = df[pd.unique(metric_records['id'])]
+            df.columns.name = None
             df.sort_index(inplace=True)
-        return loss_dataframes
+            metric_dataframes[metric_type] = df
+        return metric_dataframes
+
+    def __create_loss_dataframes(self):
+        return self.__create_metric_dataframes('loss')
 
     def __create_time_dataframes(self):
-        time_dataframes = dict()
-        # aquire plot data
-        for entry_id, entries in self.database.to_dict().items():
-            for step, entry in entries.items():
-                for time_group, time_value in flatten_dict(entry.time, delimiter ='_').items():
-                    if time_group not in time_dataframes:
-                        time_dataframes[time_group] = pd.DataFrame()
-                    time_dataframes[time_group].at[step, entry_id] = time_value
-        for df in time_dataframes.values():
-            df.index.name = "steps"
-            df.sort_index(inplace=True)
-        return time_dataframes
+        return self.__create_metric_dataframes('time')
 
     def __create_hp_dataframes(self):
-        hp_dataframes = dict()
-        # aquire plot data
-        for entry_id, entries in self.database.to_dict().items():
+        # aquire plot data in a single pass, grouped by hyper-parameter/member/step
+        hp_values = defaultdict(lambda: defaultdict(dict))
+        for entry_id, entries in self.all_entries.items():
             for step, entry in entries.items():
                 for hp_type, hp_value in entry.parameters.items(full_key = True):
-                    if hp_type not in hp_dataframes:
-                        hp_dataframes[hp_type] = pd.DataFrame()
-                    hp_dataframes[hp_type].at[step, entry_id] = hp_value.value
-        for df in hp_dataframes.values():
+                    hp_values[hp_type][entry_id][step] = hp_value.value
+        hp_dataframes = dict()
+        for hp_type, member_values in hp_values.items():
+            df = pd.DataFrame(member_values)
             df.index.name = "steps"
             df.sort_index(inplace=True)
+            hp_dataframes[hp_type] = df
         return hp_dataframes
 
-    def create_loss_plot_files(self, save_directory):
-        self.__create_loss_plot_files(directory=save_directory, prefix='loss', figsize=(10,7), save_csv=True)
-        self.__create_loss_plot_files(directory=save_directory, prefix='loss', suffix='small', figsize=(10,4), save_csv=False)
+    def create_loss_plot_files(self, save_directory, save_png: bool = False):
+        with PdfPages(Path(save_directory, "loss_plots.pdf")) as pdf:
+            self.__create_loss_plot_files(directory=save_directory, pdf=pdf, prefix='loss', figsize=(10,7), save_csv=True, save_png=save_png)
+            self.__create_loss_plot_files(directory=save_directory, pdf=pdf, prefix='loss', suffix='small', figsize=(10,4), save_csv=False, save_png=save_png)
 
-    def __create_loss_plot_files(self, directory, prefix: str = None, suffix: str = None, figsize: tuple = (10,7), save_csv: bool = False):
+    def __create_loss_plot_files(self, directory, pdf: PdfPages, prefix: str = None, suffix: str = None, figsize: tuple = (10,7), save_csv: bool = False, save_png: bool = False):
         # default style
         DEFAULT_COLOR = 'darkcyan'
         DEFAULT_LINE_SIZE = 2
@@ -200,12 +275,14 @@ class Analyzer(object):
         NAN_COLOR = 'crimson'
         NAN_MARKER_SIZE=6
         NAN_MARKER='x'
+        # create figure, which is reused for every metric
+        fig, ax = plt.subplots(figsize = figsize, sharex = True)
         # plot
         for metric_type, df in self.__create_loss_dataframes().items():
             if df.empty:
                 continue
-            # create figure
-            fig, ax = plt.subplots(figsize = figsize, sharex = True)
+            # clear figure
+            ax.clear()
             ax.set_title(metric_type)
             ax.set_xlabel("steps")
             ax.set_ylabel("value")
@@ -231,52 +308,48 @@ class Analyzer(object):
             ax.grid(axis='y', color='black', linestyle='-', linewidth=0.25)
             # save figures to directory
             filename = '_'.join(filter(None, [prefix, metric_type, suffix]))
-            save_figure_to_files(fig, directory, filename)
+            save_figure_to_files(fig, directory, filename, pdf=pdf, save_png=save_png)
             # save dataframe to csv-file
             if save_csv:
                 df.to_csv(Path(directory, f"{filename}.csv"))
-            # clear plot
-            plt.clf()
+        plt.close(fig)
 
-    def create_time_plot_files(self, save_directory):
-        self.__create_time_plot_files(directory=save_directory, prefix='time', figsize = (10,7), save_csv=True)
-        self.__create_time_plot_files(directory=save_directory, prefix='time', suffix='small', figsize = (10,4), save_csv=False)
+    def create_time_plot_files(self, save_directory, save_png: bool = False):
+        with PdfPages(Path(save_directory, "time_plots.pdf")) as pdf:
+            self.__create_time_plot_files(directory=save_directory, pdf=pdf, prefix='time', figsize = (10,7), save_csv=True, save_png=save_png)
+            self.__create_time_plot_files(directory=save_directory, pdf=pdf, prefix='time', suffix='small', figsize = (10,4), save_csv=False, save_png=save_png)
 
-    def __create_time_plot_files(self, directory, prefix: str = None, suffix: str = None, figsize = (10,7), save_csv: bool = False):
+    def __create_time_plot_files(self, directory, pdf: PdfPages, prefix: str = None, suffix: str = None, figsize = (10,7), save_csv: bool = False, save_png: bool = False):
+        # create figure, which is reused for every time group
+        fig, ax = plt.subplots(figsize = figsize, sharex = True)
         for time_group, df in self.__create_time_dataframes().items():
             if df.empty:
                 continue
-            # create figure
-            fig, ax = plt.subplots(figsize = figsize, sharex = True)
+            # clear figure
+            ax.clear()
             ax.set_title(time_group)
             ax.set_xlabel('steps')
             ax.set_ylabel('seconds')
             ax.set_ylim(ylim_from_df(df, strength=3.0))
             # plot
-            df.plot(ax = ax, legend=False, kind = 'line',  ls='none', marker='o', ms=4)
+            df.plot(ax = ax, legend=False, kind = 'line',  ls='none', marker='o', ms=4, rasterized=True)
             # draw grid
             ax.grid(axis='y', color='black', linestyle='-', linewidth=0.25)
             # save figures to directory
             filename = '_'.join(filter(None, [prefix, time_group, suffix]))
-            save_figure_to_files(fig, directory, filename)
+            save_figure_to_files(fig, directory, filename, pdf=pdf, save_png=save_png)
             # save dataframe to csv-file
             if save_csv:
                 df.to_csv(Path(directory, f"{filename}.csv"))
-            # clear plot
-            plt.clf()
+        plt.close(fig)
 
-    def __create_color(self, score, worst_score, best_score, color_map):
-        if worst_score == best_score:
-            return color_map(0.5)
-        else:
-            return color_map((score - worst_score) / (best_score - worst_score))
+    def create_hyper_parameter_plot_files(self, save_directory, save_png: bool = False):
+        with PdfPages(Path(save_directory, "hp_plots.pdf")) as pdf:
+            self.__create_hyper_parameter_plot_files_v1(directory=save_directory, pdf=pdf, prefix='hp', suffix='dots', figsize=(10,7), save_csv=True, save_png=save_png)
+            self.__create_hyper_parameter_plot_files_v2(directory=save_directory, pdf=pdf, prefix='hp', suffix='lines', figsize=(10,7), save_csv=False, save_png=save_png)
+            self.__create_hyper_parameter_plot_files_v2(directory=save_directory, pdf=pdf, prefix='hp', suffix='lines_small', figsize=(10,4), save_csv=False, save_png=save_png)
 
-    def create_hyper_parameter_plot_files(self, save_directory):
-        self.__create_hyper_parameter_plot_files_v1(directory=save_directory, prefix='hp', suffix='dots', figsize=(10,7), save_csv=True)
-        self.__create_hyper_parameter_plot_files_v2(directory=save_directory, prefix='hp', suffix='lines', figsize=(10,7), save_csv=False)
-        self.__create_hyper_parameter_plot_files_v2(directory=save_directory, prefix='hp', suffix='lines_small', figsize=(10,4), save_csv=False)
-
-    def __create_hyper_parameter_plot_files_v1(self, directory, prefix: str = '', suffix: str = '', figsize: tuple = (10,7), save_csv: bool = False):
+    def __create_hyper_parameter_plot_files_v1(self, directory, pdf: PdfPages, prefix: str = '', suffix: str = '', figsize: tuple = (10,7), save_csv: bool = False, save_png: bool = False):
         # set color map
         COLOR_MAP = plt.get_cmap('winter')
         TAB_COLORS = [COLOR_MAP(i/10) for i in range(0, 11, 1)]
@@ -294,35 +367,43 @@ class Analyzer(object):
         # create score dataframe
         score_df = self.__create_score_dataframe()
         # create color dataframe
+        best_member_id, worst_member_id = self.__best_and_worst_member_ids(score_df)
         if self.__minimize_score():
-            best_member_id = score_df.tail(1).idxmin(axis=1).to_numpy()[0]
-            worst_member_id = score_df.tail(1).idxmax(axis=1).to_numpy()[0]
-            best_score = score_df.min().min()
-            worst_score = score_df.max().max()
+            best_score = np.nanmin(score_df.to_numpy())
+            worst_score = np.nanmax(score_df.to_numpy())
         else:
-            best_member_id = score_df.tail(1).idxmax(axis=1).to_numpy()[0]
-            worst_member_id = score_df.tail(1).idxmin(axis=1).to_numpy()[0]
-            worst_score = score_df.max().max()
-            best_score = score_df.min().min()
-        color_df = score_df.clip(worst_score, best_score).applymap(partial(self.__create_color, worst_score=worst_score, best_score=best_score, color_map=TAB_MAP))
+            worst_score = np.nanmax(score_df.to_numpy())
+            best_score = np.nanmin(score_df.to_numpy())
+        scores = score_df.clip(worst_score, best_score).to_numpy(dtype=np.float64)
+        if worst_score == best_score:
+            score_fractions = np.full(scores.shape, 0.5)
+        else:
+            score_fractions = (scores - worst_score) / (best_score - worst_score)
+        # the color bins are computed once and shared by every hyper-parameter plot
+        score_bins = np.digitize(score_fractions, np.linspace(0.0, 1.0, TAB_MAP.N + 1)[1:-1])
+        score_bin_norm = matplotlib.colors.BoundaryNorm(np.arange(TAB_MAP.N + 1), TAB_MAP.N)
+        score_steps = np.broadcast_to(score_df.index.to_numpy()[:, np.newaxis], scores.shape)
+        # create colorbar mappable and labels
+        sm = plt.cm.ScalarMappable(cmap=TAB_MAP, norm=plt.Normalize(vmin=0.0, vmax=1.0))
+        colorbar_labels = [round(worst_score + x*(best_score-worst_score)/6, 1) for x in range(6)]
         # create hyper-parameter dataframe
         hp_df = self.__create_hp_dataframes()
+        # create figure and colorbar, which are reused for every hyper-parameter
+        fig, ax = plt.subplots(figsize = figsize, sharex = True)
+        colorbar = fig.colorbar(sm, ax=ax)
+        colorbar.ax.set_yticklabels(colorbar_labels)
+        colorbar.set_label('performance')
         # plot data
         for param_name, df in hp_df.items():
-            # create figure
-            fig, ax = plt.subplots(figsize = figsize, sharex = True)
+            # clear figure
+            ax.clear()
             ax.set_title(param_name)
             ax.set_xlabel("steps")
             ax.set_ylabel("value")
             # plot default
-            for column_name in df:
-                df.plot(y=column_name, ax=ax, legend=False, kind='line', ls='none', color=color_df[column_name], marker=DEFAULT_MARKER, ms=DEFAULT_MARKER_SIZE, label=column_name)
-            # plot colorbar
-            sm = plt.cm.ScalarMappable(cmap=TAB_MAP, norm=plt.Normalize(vmin=0.0, vmax=1.0))
-            colorbar = fig.colorbar(sm, ax=ax)
-            worst_score = score_df.max().max()
-            colorbar.ax.set_yticklabels([round(worst_score + x*(best_score-worst_score)/6, 1) for x in range(6)])
-            colorbar.set_label('performance')
+            values = df.reindex(index=score_df.index, columns=score_df.columns).to_numpy()
+            valid = pd.notna(values)
+            ax.scatter(score_steps[valid], values[valid], c=score_bins[valid], cmap=TAB_MAP, norm=score_bin_norm, marker=DEFAULT_MARKER, s=DEFAULT_MARKER_SIZE**2, rasterized=True)
             # plot worst
             hp_df_with_worst=df[worst_member_id]
             hp_df_with_worst.plot(ax=ax, legend=True, kind='line', ls='none', marker=WORST_MARKER, ms=WORST_MARKER_SIZE, color=WORST_COLOR, label='worst')
@@ -332,59 +413,26 @@ class Analyzer(object):
             # save figures to directory
             param_formatted = param_name.replace('/', '_')
             filename = '_'.join(filter(None, [prefix, param_formatted, suffix]))
-            save_figure_to_files(fig, directory, filename)
+            save_figure_to_files(fig, directory, filename, pdf=pdf, save_png=save_png)
             # save dataframe to csv-file
             if save_csv:
                 df.to_csv(Path(directory, f"{filename}.csv"))
-            plt.clf()
-        
-    def __create_hyper_parameter_plot_files_v2(self, directory, prefix: str = None, suffix: str = None, figsize: tuple = (10,2), save_csv: bool = False):
-        # set colors
-        FILL_COLOR = 'gainsboro'
-        MEAN_COLOR = 'gray'
-        HIGHLIGHT_COLOR = 'darkcyan'
-        NAN_COLOR = 'crimson'
-        # set markers
-        DEFAULT_LINE_SIZE = 2
-        HIGHLIGHT_LINE_SIZE = 2
-        NAN_MARKER_SIZE=6
-        HIGHLIGHT_MARKER='s'
-        NAN_MARKER='x'
+        plt.close(fig)
+
+    def __create_hyper_parameter_plot_files_v2(self, directory, pdf: PdfPages, prefix: str = None, suffix: str = None, figsize: tuple = (10,2), save_csv: bool = False, save_png: bool = False):
         # get best and worst members
         score_df = self.__create_score_dataframe()
-        if self.__minimize_score():
-            best_member_id = score_df.tail(1).idxmin(axis=1).to_numpy()[0]
-        else:
-            best_member_id = score_df.tail(1).idxmax(axis=1).to_numpy()[0]
+        best_member_id, _ = self.__best_and_worst_member_ids(score_df)
         # create hyper-parameter dataframe
         hp_df = self.__create_hp_dataframes()
-        # plot data
-        for param_name, df in hp_df.items():
-            # create figure
-            fig, ax = plt.subplots(figsize = figsize, sharex = True)
-            ax.set_title(param_name)
-            ax.set_xlabel("steps")
-            ax.set_ylabel("value")
-            # plot fill
-            ax.fill_between(df.index, y1=df.min(axis=1), y2=df.max(axis=1), color=FILL_COLOR)
-            # plot lines
-            df.plot(ax=ax, legend=False, kind='line', ls='solid', solid_capstyle='round', linewidth=DEFAULT_LINE_SIZE, color=HIGHLIGHT_COLOR, alpha=0.2)
-            df.mean(axis=1).plot(ax=ax, legend=True, kind='line', ls='solid', linewidth=DEFAULT_LINE_SIZE, color=MEAN_COLOR, label='mean')
-            # plot best
-            hp_df_with_best=df[best_member_id]
-            hp_df_with_best.plot(ax=ax, legend=True, kind='line', ls='solid', linewidth=HIGHLIGHT_LINE_SIZE, color=HIGHLIGHT_COLOR, marker=HIGHLIGHT_MARKER, ms=6, label='best')
-            # plot end points
-            nan_df = pd.DataFrame()
-            for column_name in df.loc[:, df.isna().any()]:
-                index = df[column_name].last_valid_index()
-                nan_df.at[index, 'end'] = df.at[index,column_name]
-            if not nan_df.empty:
-                nan_df.plot(ax=ax, legend=True, kind='line', ls='none', marker=NAN_MARKER, ms=NAN_MARKER_SIZE, color=NAN_COLOR)
-            # save figures to directory
-            param_formatted = param_name.replace('/', '_')
-            filename = '_'.join(filter(None, [prefix, param_formatted, suffix]))
-            save_figure_to_files(fig, directory, filename)
-            # save dataframe to csv-file
-            if save_csv:
-                df.to_csv(Path(directory, f"{filename}.csv"))
-            plt.clf()
\ No newline at end of file
+        # plot data, each figure is independent and can be created in a separate process
+        plot_function = partial(plot_hyper_parameter_lines, best_member_id=best_member_id, directory=directory,
+            prefix=prefix, suffix=suffix, figsize=figsize, save_csv=save_csv, save_png=save_png)
+        if self.n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                figures = executor.map(plot_function, hp_df.keys(), hp_df.values())
+                for fig in figures:
+                    pdf.savefig(fig, transparent=True, dpi=150)
+        else:
+            for param_name, df in hp_df.items():
+                pdf.savefig(plot_function(param_name, df), transparent=True, dpi=150)
@@ -4,8 +4,9 @@ import dill
 import copy
 from datetime import datetime, timedelta
 from abc import abstractmethod
-from typing import List, Sequence, Iterable, Callable, Generator
+from typing import Dict, List, Sequence, Iterable, Callable, Generator
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.managers import SyncManager
 
 from torch.utils.data import Dataset
@@ -14,7 +15,7 @@ from torch.utils.tensorboard import SummaryWriter
 from pbt.device import DeviceCallable
 from pbt.worker_pool import WorkerPool
 from pbt.member import Checkpoint, Generation
-from pbt.utils.date import get_datetime_string
+from pbt.utils.multiprocessing import SharedMemoryDict
 from pbt.hyperparameters import DiscreteHyperparameter, Hyperparameters, hyper_parameter_change_details
 from pbt.nn import Evaluator, Step
 from pbt.evolution import EvolutionEngine
@@ -75,6 +76,7 @@ class Controller(object):
         if not isinstance(n_jobs, int):
             raise TypeError(f"the 'n_jobs' specified was of wrong type {type(n_jobs)}, expected {int}.")
         self._manager = manager
+        self._n_jobs = n_jobs
         self._worker_pool = WorkerPool(
             manager=manager, devices=devices, n_jobs=n_jobs, verbose=verbose - 3)
         self.evolver = evolver
@@ -82,10 +84,17 @@ class Controller(object):
         self.population_size = population_size
         self.database = database
         self.hyper_parameters = hyper_parameters
+        # the members share the hyper-parameter types of the prototype
+        self.__is_discrete = {
+            hparam_name: isinstance(hparam, DiscreteHyperparameter) for hparam_name, hparam in hyper_parameters.items()}
         self.loss_metric = loss_metric
         self.eval_metric = eval_metric
         self.loss_functions = loss_functions
         self.end_criteria = end_criteria
+        # the step limit is shown in every message
+        self.__steps_limit = end_criteria.get('steps')
+        # the score limit is checked for every trained member
+        self.__score_limit = end_criteria.get('score') or None
         self.verbose = verbose
         self.logging = logging
         # create training function
@@ -104,6 +113,8 @@ class Controller(object):
         self.__n_generations = 0
         self.__start_time = None
         self.__tensorboard = tensorboard
+        self.__log_files = dict()
+        self.__end_checks = self.__create_end_checks()
 
     @property
     def end_time(self):
@@ -112,17 +123,17 @@ class Controller(object):
         return self.__start_time + timedelta(minutes=self.end_criteria['time'])
 
     def _print_prefix(self) -> str:
-        if self.end_criteria['steps']:
-            return f"({self.__n_steps}/{self.end_criteria['steps']})"
+        if self.__steps_limit:
+            return f"({self.__n_steps}/{self.__steps_limit})"
         else:
             return ""
 
     def __create_message(self, message: str) -> str:
-        time = get_datetime_string()
-        generation = f"G{self.__n_generations:03d}"
-        prefixes = ' '.join(prefix for prefix in (
-            time, generation, self._print_prefix()) if prefix is not None)
-        return f"{prefixes}: {message}"
+        date_and_time = time.strftime('%Y-%m-%d %H:%M:%S')
+        prefix = self._print_prefix()
+        if not prefix:
+            return f"{date_and_time} G{self.__n_generations:03d}: {message}"
+        return f"{date_and_time} G{self.__n_generations:03d} {prefix}: {message}"
 
     def _say(self, message: str) -> None:
         """Prints the provided controller message in the appropriate syntax if verbosity level is above 0."""
@@ -148,8 +159,15 @@ class Controller(object):
     def __log_to_file(self, message: str, tag: str) -> None:
         if not self.logging:
             return
-        with self.database.create_file(tag='logs', file_name=f"{tag}_log.txt").open('a+') as file:
-            file.write(message + '\n')
+        # the log files are kept open, and are flushed on every line
+        if tag not in self.__log_files:
+            self.__log_files[tag] = self.database.create_file(tag='logs', file_name=f"{tag}_log.txt").open('a+', buffering=1)
+        self.__log_files[tag].write(message + '\n')
+
+    def __close_log_files(self) -> None:
+        for file in self.__log_files.values():
+            file.close()
+        self.__log_files.clear()
 
     def __log_to_tensorboard(self, message: str, tag: str, global_steps: int = None) -> None:
         if not self.__tensorboard:
@@ -157,82 +175,101 @@ class Controller(object):
         self.__tensorboard.add_text(
             tag=tag, text_string=message, global_step=global_steps)
 
-    def __update_tensorboard(self, member: Checkpoint) -> None:
-        """Plots member data to tensorboard."""
+    def __tensorboard_scalars(self, member: Checkpoint) -> Dict[str, float]:
+        """Returns the tag/value dictionary of the eval metrics, times and hyper-parameters of the member."""
+        uid = f"{member.uid:03d}"
+        scalars = {
+            f"metrics/{eval_metric_group}_{metric_name}/{uid}": metric_value
+            for eval_metric_group, eval_metrics in member.loss.items()
+            for metric_name, metric_value in eval_metrics.items()}
+        scalars.update({
+            f"time/{time_type}/{uid}": time_value
+            for time_type, time_value in member.time.items()})
+        scalars.update({
+            f"hyperparameters/{hparam_name}/{uid}": hparam.normalized if self.__is_discrete[hparam_name] else hparam.value
+            for hparam_name, hparam in member.parameters.items()})
+        return scalars
+
+    def __update_tensorboard(self, members: Iterable[Checkpoint]) -> None:
+        """Plots the data of the members to tensorboard. The events are flushed to the event file once for all members."""
         if self.__tensorboard is None:
             return
-        # plot eval metrics
-        for eval_metric_group, eval_metrics in member.loss.items():
-            for metric_name, metric_value in eval_metrics.items():
+        walltime = time.time()
+        for member in members:
+            for tag, scalar_value in self.__tensorboard_scalars(member).items():
                 self.__tensorboard.add_scalar(
-                    tag=f"metrics/{eval_metric_group}_{metric_name}/{member.uid:03d}",
-                    scalar_value=metric_value,
-                    global_step=member.steps)
-        # plot time
-        for time_type, time_value in member.time.items():
-            self.__tensorboard.add_scalar(
-                tag=f"time/{time_type}/{member.uid:03d}",
-                scalar_value=time_value,
-                global_step=member.steps)
-        # plot hyper-parameters
-        for hparam_name, hparam in member.parameters.items():
-            self.__tensorboard.add_scalar(
-                tag=f"hyperparameters/{hparam_name}/{member.uid:03d}",
-                scalar_value=hparam.normalized if isinstance(
-                    hparam, DiscreteHyperparameter) else hparam.value,
-                global_step=member.steps)
+                    tag=tag, scalar_value=scalar_value, global_step=member.steps, walltime=walltime)
+        self.__tensorboard.flush()
 
     def __create_member(self, uid) -> Checkpoint:
         """Create a member object."""
         # create new member object
         member = Checkpoint(
             uid=uid,
-            parameters=copy.deepcopy(self.hyper_parameters),
+            parameters=self.hyper_parameters.clone(),
             loss_metric=self.loss_metric,
             eval_metric=self.eval_metric,
             minimize=self.loss_functions[self.eval_metric].minimize)
         return member
 
     def __create_members(self, k: int) -> List[Checkpoint]:
-        members = list()
-        for uid in range(k):
-            members.append(self.__create_member(uid))
-        return members
+        # creating a member only clones the hyperparameters, which is cheaper than dispatching it to a pool,
+        # and the worker processes are already starting in the background while the members are created
+        return [self.__create_member(uid) for uid in range(k)]
 
     def __create_initial_generation(self) -> Generation:
         new_members = self.__create_members(k=self.population_size)
         return new_members
 
-    def __update_database(self, member: Checkpoint) -> None:
-        """Updates the database stored in files."""
-        self.database.update(member.uid, member.steps, member)
+    def __update_database(self, members: Iterable[Checkpoint]) -> None:
+        """Updates the database stored in files in the background."""
+        # the members are copied, as their states may share memory with the workers that train them in the next generation
+        members = [member.copy() for member in members]
+        self.__pending_writes.append(self.__write_pool.submit(
+            self.database.update_all, ((member.uid, member.steps, member) for member in members)))
+
+    def __collect_garbage(self, exclude: List[Checkpoint]) -> None:
+        """Collects garbage in the background, after the pending database updates."""
+        self.__pending_writes.append(self.__write_pool.submit(
+            self.__garbage_collector.collect, exclude=exclude))
 
-    def __is_score_end(self, generation):
-        return 'score' in self.end_criteria and self.end_criteria['score'] and any(member >= self.end_criteria['score'] for member in generation)
+    def __wait_for_writes(self) -> None:
+        """Waits for the pending database updates, and raises their exceptions, if any."""
+        for future in self.__pending_writes:
+            future.result()
+        self.__pending_writes.clear()
 
-    def __is_time_end(self):
-        return 'time' in self.end_criteria and self.end_criteria['time'] and datetime.now() >= self.end_time
+    def __create_end_checks(self) -> List[tuple]:
+        """Creates the message and the predicate of each end criterium that is set. The criteria are only looked up once."""
+        checks = list()
+        if self.end_criteria.get('score'):
+            checks.append(("Score criterium has been met!", partial(self.__is_score_end, self.end_criteria['score'])))
+        if self.end_criteria.get('time'):
+            checks.append(("Time criterium has been met!", self.__is_time_end))
+        if self.end_criteria.get('generations'):
+            checks.append(("Number of generations criterium has been met!", partial(self.__is_n_generations_end, self.end_criteria['generations'])))
+        if self.end_criteria.get('steps'):
+            checks.append(("Step criterium has been met!", partial(self.__is_steps_end, self.end_criteria['steps'])))
+        return checks
 
-    def __is_n_generations_end(self):
-        return 'generations' in self.end_criteria and self.end_criteria['generations'] and self.__n_generations >= self.end_criteria['generations']
+    def __is_score_end(self, score, generation):
+        return any(member >= score for member in generation)
 
-    def __is_steps_end(self):
-        return 'steps' in self.end_criteria and self.end_criteria['steps'] and self.__n_steps >= self.end_criteria['steps']
+    def __is_time_end(self, generation):
+        return datetime.now() >= self.end_time
+
+    def __is_n_generations_end(self, generations, generation):
+        return self.__n_generations >= generations
+
+    def __is_steps_end(self, steps, generation):
+        return self.__n_steps >= steps
 
     def _is_finished(self, generation: Generation) -> bool:
         """With the end_criteria, check if the generation is finished by inspecting the provided member."""
-        if self.__is_score_end(generation):
-            self._say("Score criterium has been met!")
-            return True
-        if self.__is_time_end():
-            self._say("Time criterium has been met!")
-            return True
-        if self.__is_n_generations_end():
-            self._say("Number of generations criterium has been met!")
-            return True
-        if self.__is_steps_end():
-            self._say("Step criterium has been met!")
-            return True
+        for message, is_end in self.__end_checks:
+            if is_end(generation):
+                self._say(message)
+                return True
         return False
 
     def _on_start(self) -> None:
@@ -241,11 +278,23 @@ class Controller(object):
         self.__start_time = datetime.now()
         self.__n_generations = 0
         self.__n_steps = 0
+        # a single writer keeps the database updates in order
+        self.__write_pool = ThreadPoolExecutor(max_workers=1)
+        self.__pending_writes = list()
+        # the shared dictionaries are closed on stop, which unlinks the shared memory of the members they hold
+        self.__shared_dicts = list()
         self._worker_pool.start()
 
     def _on_stop(self) -> None:
         """Stop controller."""
         self._worker_pool.stop()
+        try:
+            self.__wait_for_writes()
+        finally:
+            self.__write_pool.shutdown()
+            self.__close_log_files()
+            for shared_dict in self.__shared_dicts:
+                shared_dict.close()
 
     def __train_synchronously(self) -> Generation:
         """
@@ -256,24 +305,33 @@ class Controller(object):
         self._say("Creating initial generation...")
         initial_members = self.__create_initial_generation()
         for generation in self._train(initial_members):
+            # wait for the members of the previous generation to be saved
+            self.__wait_for_writes()
             # Save member to database directory.
             self._whisper(f"saving members to database...")
-            [self.__update_database(member) for member in generation]
+            self.__update_database(generation)
             # write to tensorboard if enabled
-            [self.__update_tensorboard(member) for member in generation]
+            self.__update_tensorboard(generation)
             # perform garbage collection
             self._whisper("performing garbage collection...")
-            self.__garbage_collector.collect(exclude=list(generation))
+            self.__collect_garbage(exclude=list(generation))
             # increment number of generations
             self.__n_generations += 1
         self._say(f"end criteria has been reached.")
         return max(generation)
 
+    def __create_shared_dict(self) -> SharedMemoryDict:
+        shared_dict = SharedMemoryDict(self._manager)
+        self.__shared_dicts.append(shared_dict)
+        return shared_dict
+
     def _train(self, initial: Iterable[Checkpoint]) -> Generator[List[Checkpoint], None, None]:
         # spawn members
         spawned_members = self.evolver.spawn(initial)
-        # create generation
-        generation = Generation(dict_constructor=self._manager.dict, members=spawned_members)
+        # create generation, which only needs to be shared between processes when there are multiple workers
+        # a single worker receives its own copy of the generation with each task
+        dict_constructor = dict if self._n_jobs == 1 else self.__create_shared_dict
+        generation = Generation(dict_constructor=dict_constructor, members=spawned_members)
         # start synchronous main loop
         while not self._is_finished(generation):
             with self.evolver.next(generation) as evolve_function:
@@ -284,21 +342,28 @@ class Controller(object):
                     evolve_function=evolve_function, is_ready_function=always_ready, verbose=self.verbose > 3)
                 # train generation
                 self._whisper("training next generation...")
+                is_score_met = False
                 for member in self._worker_pool.imap(async_train_task, list(generation), shuffle=True):
                     # increment collective number of steps
                     self.__n_steps += 1
                     # report member performance
                     self._say(f"{member}, {member.performance_details()}")
+                    # check the score criterium as the members are returned
+                    is_score_met = is_score_met or (self.__score_limit is not None and member >= self.__score_limit)
                     # update generation
                     generation.update(member)
-                # adapt generation
-                self._whisper("adapting next generation...")
-                for member in self._worker_pool.imap(async_adapt_task, list(generation), shuffle=True):
-                    # report member performance
-                    self._say(f"{member}, {member.performance_details()}")
-                    self._whisper(f"{member}, {hyper_parameter_change_details(old_hps=generation[member.uid].parameters, new_hps=member.parameters)}")
-                    # update generation
-                    generation.update(member)
+                # the generation is finished when the score criterium is met, so it is not adapted
+                if is_score_met:
+                    self._whisper("score criterium met, skipping adaptation...")
+                else:
+                    # adapt generation
+                    self._whisper("adapting next generation...")
+                    for member in self._worker_pool.imap(async_adapt_task, list(generation), shuffle=True):
+                        # report member performance
+                        self._say(f"{member}, {member.performance_details()}")
+                        self._whisper(f"{member}, {hyper_parameter_change_details(old_hps=generation[member.uid].parameters, new_hps=member.parameters)}")
+                        # update generation
+                        generation.update(member)
             yield list(generation)
     
     def start(self) -> Checkpoint:
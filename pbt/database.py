@@ -1,15 +1,87 @@
+import io
+import os
 import glob
+import mmap
 import pickle
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, Union, Callable, TypeVar, Generator
+from functools import partial
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple, Union, Callable, TypeVar, Generator, Iterable
+
+import numpy as np
 
 Entity = TypeVar('Entity')
 
+PAGE_SIZE = mmap.PAGESIZE
+# entries are only unpickled in a process pool when there are at least this many to read
+PARALLEL_READ_THRESHOLD = 64
+
+def buffer_file_path(path: Path) -> Path:
+    """ Returns the path of the file holding the out-of-band buffers of the entry stored on the specified path. """
+    return path.with_name(f"{path.name}.buf")
+
+def buffer_offsets(lengths: List[int]) -> List[int]:
+    """ Returns the page-aligned offsets of buffers with the specified lengths, placed after a header holding the lengths. """
+    header_size = len(pickle.dumps(lengths, protocol=pickle.HIGHEST_PROTOCOL))
+    offsets = list()
+    offset = PAGE_SIZE * (1 + header_size // PAGE_SIZE)
+    for length in lengths:
+        offsets.append(offset)
+        offset += PAGE_SIZE * (1 + length // PAGE_SIZE)
+    return offsets
+
+def write_pickle(entry: Entity, path: Path) -> None:
+    """ Pickles the entry to the specified path with protocol 5. Buffers that support out-of-band pickling, like numpy arrays, are written page-aligned to a separate buffer file instead of being copied into the pickle stream. """
+    buffers = list()
+    with path.open('wb') as file:
+        pickle.Pickler(file, protocol=5, buffer_callback=buffers.append).dump(entry)
+    if not buffers:
+        return
+    raw_buffers = [buffer.raw() for buffer in buffers]
+    lengths = [raw_buffer.nbytes for raw_buffer in raw_buffers]
+    with buffer_file_path(path).open('wb') as file:
+        pickle.dump(lengths, file, protocol=pickle.HIGHEST_PROTOCOL)
+        for offset, raw_buffer in zip(buffer_offsets(lengths), raw_buffers):
+            file.seek(offset)
+            file.write(raw_buffer)
+
+def read_pickle(path: Path) -> Entity:
+    """ Unpickles the entry on the specified path. If the entry was written with out-of-band buffers, the buffers are memory-mapped from the buffer file. """
+    buffer_path = buffer_file_path(path)
+    if not buffer_path.is_file():
+        with path.open('rb') as file:
+            return pickle.load(file)
+    with buffer_path.open('rb') as file:
+        lengths = pickle.load(file)
+    # copy-on-write keeps the unpickled arrays writable without touching the file
+    buffer_map = np.memmap(buffer_path, dtype=np.uint8, mode='c')
+    buffers = [buffer_map[offset:offset + length] for offset, length in zip(buffer_offsets(lengths), lengths)]
+    with path.open('rb') as file:
+        return pickle.load(file, buffers=buffers)
+
+def replace_pickle(obj: Any, path: Path) -> None:
+    """ Pickles the object to a temporary file next to the specified path, and replaces the file on the path with it, so a crash never leaves a partially written file behind. """
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with temp_path.open('wb') as file:
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def read_entry_bytes(read_function: Callable[[io.BytesIO], Entity], data: bytes) -> Entity:
+    """ Deserializes an entry stored in an entry log with the specified read function, or with pickle if no read function is specified. """
+    return read_function(io.BytesIO(data)) if read_function else pickle.loads(data)
+
+def call(function: Callable[[Any], Entity], argument: Any) -> Entity:
+    return function(argument)
+
 class ReadOnlyDatabase(object):
 
     ENTRIES_TAG = 'entries'
+    LOG_EXTENSION = 'log'
+    INDEX_EXTENSION = 'idx'
+    HEADER_EXTENSION = 'hdr'
 
     def __init__(self, database_path: Union[Path, str], read_function: Callable[[str], Entity] = None, extension: str = "obj"):
         if not isinstance(database_path, (Path, str)):
@@ -21,8 +93,10 @@ class ReadOnlyDatabase(object):
         self.extension = extension
         self.path = Path(database_path)
         # set read function
-        def read(path): return pickle.load(path.open('rb'))
-        self.read = read if not read_function else read_function
+        self.read_function = read_function
+        self.read = read_pickle if not read_function else read_function
+        # uid/(modification signature, entries) cache used by to_dict
+        self.__cache = dict()
 
     @property
     def exists(self) -> bool:
@@ -30,15 +104,17 @@ class ReadOnlyDatabase(object):
 
     def __len__(self) -> int:
         entries_path = Path(self.path, ReadOnlyDatabase.ENTRIES_TAG)
-        return len(list(entries_path.glob(f'**/*.{self.extension}')))
+        n_files = len(list(entries_path.glob(f'**/*.{self.extension}')))
+        n_logged = sum(len(self.entry_index(index_path.stem)) for index_path in entries_path.glob(f'*.{ReadOnlyDatabase.INDEX_EXTENSION}'))
+        return n_files + n_logged
 
     def __iter__(self) -> Generator[Entity, None, None]:
-        for directory in self.entry_directories():
-            for entry in self.entries_from_path(directory):
+        for uid in self.uids():
+            for entry in self.entries(uid):
                 yield entry
 
     def __contains__(self, uid: Any):
-        return self.create_entry_directoy_path(uid).exists()
+        return self.create_entry_directoy_path(uid).exists() or self.create_entry_index_path(uid).exists()
 
     def create_entry_file_name(self, key: Any):
         return f"{key}.{self.extension}"
@@ -53,16 +129,79 @@ class ReadOnlyDatabase(object):
         entry_file_name = self.create_entry_file_name(key)
         return Path(entry_directory, entry_file_name)
 
+    def create_entry_log_path(self, uid: Any) -> Path:
+        """ Creates the file path of the log holding the entries of the specified uid. """
+        return Path(self.path, ReadOnlyDatabase.ENTRIES_TAG, f"{uid}.{ReadOnlyDatabase.LOG_EXTENSION}")
+
+    def create_entry_index_path(self, uid: Any) -> Path:
+        """ Creates the file path of the key/location index of the entry log of the specified uid. """
+        return Path(self.path, ReadOnlyDatabase.ENTRIES_TAG, f"{uid}.{ReadOnlyDatabase.INDEX_EXTENSION}")
+
+    def create_entry_header_path(self, uid: Any) -> Path:
+        """ Creates the file path of the key/header file of the entries of the specified uid. """
+        return Path(self.path, ReadOnlyDatabase.ENTRIES_TAG, f"{uid}.{ReadOnlyDatabase.HEADER_EXTENSION}")
+
+    def entry_index(self, uid: Any) -> Dict[str, Tuple[int, int]]:
+        """ Returns the key/(offset, length) index of the entry log of the specified uid. The index is empty if the uid has no entry log. """
+        index_path = self.create_entry_index_path(uid)
+        if not index_path.is_file():
+            return dict()
+        with index_path.open('rb') as file:
+            return pickle.load(file)
+
+    def entry_headers(self, uid: Any) -> Dict[str, Entity]:
+        """ Returns the key/header dictionary of the entries of the specified uid. The dictionary is empty if no headers were written. """
+        header_path = self.create_entry_header_path(uid)
+        if not header_path.is_file():
+            return dict()
+        with header_path.open('rb') as file:
+            return pickle.load(file)
+
+    def read_bytes(self, data: bytes) -> Entity:
+        """ Deserializes an entry stored in an entry log. """
+        return read_entry_bytes(self.read_function, data)
+
+    def raw_entries_from_log(self, uid: Any) -> Generator[bytes, None, None]:
+        """ Retrieve the serialized data of all entries in the entry log of the specified uid. """
+        index = self.entry_index(uid)
+        if not index:
+            return
+        with self.create_entry_log_path(uid).open('rb') as file:
+            for offset, length in index.values():
+                file.seek(offset)
+                yield file.read(length)
+
+    def entries_from_log(self, uid: Any) -> Generator[Entity, None, None]:
+        """ Retrieve all entries in the entry log of the specified uid. """
+        for data in self.raw_entries_from_log(uid):
+            yield self.read_bytes(data)
+
     def entry(self, uid: Any, key: Any) -> Entity:
         """ Returns the specific entry stored on the specified uid. If there is no match, None is returned. """
         entry_file_path = self.create_entry_file_path(uid, key)
-        return self.read(entry_file_path) if entry_file_path.is_file() else None
+        if entry_file_path.is_file():
+            return self.read(entry_file_path)
+        location = self.entry_index(uid).get(str(key))
+        if location is None:
+            return None
+        offset, length = location
+        with self.create_entry_log_path(uid).open('rb') as file:
+            file.seek(offset)
+            return self.read_bytes(file.read(length))
 
     def entries(self, uid: Any) -> Generator[Entity, None, None]:
-        """ Iterate over the entry directory matching the specified uid and yield all entries inside the directory. """
+        """ Iterate over the entry directory and the entry log matching the specified uid and yield all entries inside them. """
         entry_directory = self.create_entry_directoy_path(uid)
         for content in entry_directory.glob(f"*.{self.extension}"):
             yield self.read(content)
+        yield from self.entries_from_log(uid)
+
+    def uids(self) -> Generator[str, None, None]:
+        """ Yields the uid of every entry directory and entry log in the database. """
+        entries_path = Path(self.path, ReadOnlyDatabase.ENTRIES_TAG)
+        for content in entries_path.iterdir():
+            if content.is_dir() or content.suffix == f".{ReadOnlyDatabase.INDEX_EXTENSION}":
+                yield content.stem
 
     def entry_directories(self) -> Generator[Path, None, None]:
         entries_path = Path(self.path, ReadOnlyDatabase.ENTRIES_TAG)
@@ -77,10 +216,11 @@ class ReadOnlyDatabase(object):
     def identy_records(self) -> Dict[str, list]:
         """ Returns a uid/keys dictionary. """
         result = dict()
-        for directory in self.entry_directories():
-            result[directory.name] = list()
-            for key_path in directory.glob("*"):
-                result[directory.name].append(key_path.stem)
+        for uid in self.uids():
+            keys = result.setdefault(uid, list())
+            for key_path in self.create_entry_directoy_path(uid).glob(f"*.{self.extension}"):
+                keys.append(key_path.stem)
+            keys.extend(self.entry_index(uid))
         return result
 
     def get_first(self) -> Generator[Entity, None, None]:
@@ -101,27 +241,88 @@ class ReadOnlyDatabase(object):
                 continue
             yield self.entry(uid, max_key)
 
-    def to_dict(self) -> dict:
-        """ Returns a the database converted to a dictionary grouped by uid/filename/entry"""
+    def scan_entries(self) -> Dict[str, Tuple[os.DirEntry, os.DirEntry]]:
+        """ Scans the entries directory once and returns a uid/(entry directory, entry log index) dictionary. Either is None if the uid does not have one. """
+        scanned = dict()
+        with os.scandir(Path(self.path, ReadOnlyDatabase.ENTRIES_TAG)) as iterator:
+            for content in iterator:
+                if content.is_dir(follow_symlinks=False):
+                    directory, index = scanned.get(content.name, (None, None))
+                    scanned[content.name] = (content, index)
+                elif content.name.endswith(f".{ReadOnlyDatabase.INDEX_EXTENSION}"):
+                    uid = content.name[:-len(ReadOnlyDatabase.INDEX_EXTENSION) - 1]
+                    directory, index = scanned.get(uid, (None, None))
+                    scanned[uid] = (directory, content)
+        return scanned
+
+    def entry_file_paths(self, entry_directory: os.DirEntry) -> List[Path]:
+        """ Returns the paths of the entry files in the scanned entry directory. """
+        with os.scandir(entry_directory.path) as iterator:
+            return [Path(content.path) for content in iterator
+                if content.name.endswith(f".{self.extension}") and content.is_file(follow_symlinks=False)]
+
+    def get_last_headers(self) -> Generator[Entity, None, None]:
+        """ Returns an iterator over the headers of the last entries in this database. Headers are small summaries of the entries, which are read without reading the entries themselves. """
+        headers = {uid: self.entry_headers(uid) for uid in self.uids()}
+        if not all(headers.values()):
+            return
+        max_steps = max(max(int(key) for key in keys) for keys in headers.values())
+        for keys in headers.values():
+            max_key = max(keys, key=int)
+            if int(max_key) < max_steps:
+                continue
+            yield keys[max_key]
+
+    def to_dict(self, use_cache: bool = True) -> dict:
+        """ Returns a the database converted to a dictionary grouped by uid/filename/entry. With use_cache, the entries of a uid are only read again if its entry directory or entry log was modified since the last call. """
         dict_of_entries = dict()
-        for directory in self.entry_directories():
-            entries = self.entries_from_path(directory)
-            if not directory.name in dict_of_entries:
-                dict_of_entries[directory.name] = dict()
-            for entry in entries:
-                dict_of_entries[directory.name][entry.steps] = entry
+        signatures = dict()
+        scanned = self.scan_entries()
+        for uid, contents in scanned.items():
+            # the modification times change whenever an entry is added to the directory or the log
+            signature = tuple(content.stat().st_mtime_ns if content else 0 for content in contents) if use_cache else None
+            if use_cache and uid in self.__cache and self.__cache[uid][0] == signature:
+                dict_of_entries[uid] = dict(self.__cache[uid][1])
+                continue
+            dict_of_entries[uid] = dict()
+            signatures[uid] = signature
+        # collect the entry files and logged entry data to read
+        uids, functions, arguments = list(), list(), list()
+        read_bytes = partial(read_entry_bytes, self.read_function)
+        for uid in signatures:
+            entry_directory, entry_index = scanned[uid]
+            for path in self.entry_file_paths(entry_directory) if entry_directory else ():
+                uids.append(uid)
+                functions.append(self.read)
+                arguments.append(path)
+            for data in self.raw_entries_from_log(uid) if entry_index else ():
+                uids.append(uid)
+                functions.append(read_bytes)
+                arguments.append(data)
+        # unpickling is bound by the CPU, so larger reads are spread over multiple processes
+        if len(arguments) < PARALLEL_READ_THRESHOLD:
+            entries = map(call, functions, arguments)
+        else:
+            with ProcessPoolExecutor() as executor:
+                entries = list(executor.map(call, functions, arguments, chunksize=16))
+        for uid, entry in zip(uids, entries):
+            dict_of_entries[uid][entry.steps] = entry
+        if use_cache:
+            for uid, signature in signatures.items():
+                self.__cache[uid] = (signature, dict(dict_of_entries[uid]))
         return dict_of_entries
 
     def print(self) -> None:
-        """ Prints all entries in the database. """
-        for entry in sorted(self, key=lambda x: (x.uid, x.steps), reverse=False):
+        """ Prints all entries in the database. The entries are taken from the cached dictionary of the database, so unchanged entries are not read again. """
+        entries = [entry for uid_entries in self.to_dict().values() for entry in uid_entries.values()]
+        for entry in sorted(entries, key=attrgetter('uid', 'steps')):
             print(entry)
 
 class Database(ReadOnlyDatabase):
     def __init__(
             self, directory_path: Union[Path, str], database_name: str = None,
             read_function: Callable[[str], Entity] = None, write_function: Callable[[Entity], None] = None,
-            extension: str = "obj"):
+            extension: str = "obj", aggregate_entries: bool = False, header_function: Callable[[Entity], Entity] = None):
         if not isinstance(directory_path, (Path, str)):
             raise TypeError(f"the 'directory_path' specified was of wrong type {type(directory_path)}, expected {Path} or {str}.")
         if database_name is not None and not isinstance(database_name, str):
@@ -132,6 +333,10 @@ class Database(ReadOnlyDatabase):
             raise TypeError(f"the 'write_function' specified was not callable.")
         if not isinstance(extension, str):
             raise TypeError(f"the 'extension' specified was of wrong type {type(extension)}, expected {str}.")
+        if not isinstance(aggregate_entries, bool):
+            raise TypeError(f"the 'aggregate_entries' specified was of wrong type {type(aggregate_entries)}, expected {bool}.")
+        if header_function is not None and not callable(header_function):
+            raise TypeError(f"the 'header_function' specified was not callable.")
         # set database path
         if not database_name:
             database_name = datetime.now().strftime('%Y%m%d%H%M%S')
@@ -143,8 +348,14 @@ class Database(ReadOnlyDatabase):
         # create database directory
         self.path.mkdir(parents=True, exist_ok=True)
         # set write function
-        def write(entry, path): pickle.dump(entry, path.open('wb'))
-        self.write = write if not write_function else write_function
+        self.write_function = write_function
+        self.write = write_pickle if not write_function else write_function
+        # entries of the same uid are appended to a single log file instead of one file each
+        self.aggregate_entries = aggregate_entries
+        self.__indices = dict()
+        # small summaries of the entries, which can be read without reading the entries
+        self.header_function = header_function
+        self.__headers = dict()
 
     def create_folder(self, name: str) -> Path:
         """ Create a new folder located in the database base directory. Name supports nested directories of type dir/sub_dir/sub_sub_dir/etc. """
@@ -158,8 +369,58 @@ class Database(ReadOnlyDatabase):
         file_path.parent.mkdir(parents=True, exist_ok=True)
         return file_path
 
+    def write_bytes(self, entry: Entity) -> bytes:
+        """ Serializes an entry to be stored in an entry log. The entry is stored in-band, as the page-aligned buffer files of write_pickle are only written for entries stored in their own files. """
+        if not self.write_function:
+            return pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        buffer = io.BytesIO()
+        self.write_function(entry, buffer)
+        return buffer.getvalue()
+
+    def append(self, uid: Any, key: Any, entry: Entity) -> None:
+        """ Append the provided database entry to the entry log of the uid, and record its location in the index of the log. """
+        data = self.write_bytes(entry)
+        log_path = self.create_entry_log_path(uid)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with log_path.open('ab') as file:
+            offset = file.seek(0, io.SEEK_END)
+            file.write(data)
+        if uid not in self.__indices:
+            self.__indices[uid] = self.entry_index(uid)
+        index = self.__indices[uid]
+        index[str(key)] = (offset, len(data))
+        replace_pickle(index, self.create_entry_index_path(uid))
+
+    def update_header(self, uid: Any, key: Any, entry: Entity) -> None:
+        """ Record the header of the provided database entry in the header file of the uid. """
+        if uid not in self.__headers:
+            self.__headers[uid] = self.entry_headers(uid)
+        headers = self.__headers[uid]
+        headers[str(key)] = self.header_function(entry)
+        header_path = self.create_entry_header_path(uid)
+        header_path.parent.mkdir(parents=True, exist_ok=True)
+        replace_pickle(headers, header_path)
+
     def update(self, uid: Any, key: Any, entry: Entity) -> None:
         """ Save the provided database entry to a file on uid/key inside the database directory. """
+        if self.header_function:
+            self.update_header(uid, key, entry)
+        if self.aggregate_entries:
+            self.append(uid, key, entry)
+            return
         entry_file_path = self.create_entry_file_path(uid, key)
         entry_file_path.parent.mkdir(parents=True, exist_ok=True)
-        self.write(entry, entry_file_path)
\ No newline at end of file
+        self.write(entry, entry_file_path)
+
+    def __update_uid(self, uid: Any, records: List[Tuple[Any, Entity]]) -> None:
+        for key, entry in records:
+            self.update(uid, key, entry)
+
+    def update_all(self, records: Iterable[Tuple[Any, Any, Entity]], max_workers: int = None) -> None:
+        """ Save the provided uid/key/entry records to files inside the database directory. The files of different uids are written concurrently, as the writes are bound by I/O, while the records of the same uid are written in order, as they share the index and header files of the uid. """
+        records_by_uid = dict()
+        for uid, key, entry in records:
+            records_by_uid.setdefault(uid, list()).append((key, entry))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(self.__update_uid, uid, uid_records) for uid, uid_records in records_by_uid.items()]:
+                future.result()
@@ -1,5 +1,7 @@
 import random
 
+import numpy as np
+
 def random_reinitialization(mutant, lower_bounds, upper_bounds):
     """
     Page 204, Price, K., Storn, R. M., & Lampinen, J. A. (2005).
@@ -30,4 +32,8 @@ def halving(base, mutant, lower_bounds, upper_bounds):
         return (lower_bounds + base) / 2
     if mutant > upper_bounds:
         return (upper_bounds + base) / 2
-    return mutant
\ No newline at end of file
+    return mutant
+
+def halving_array(base, mutant, lower_bounds, upper_bounds):
+    """Element-wise halving of the mutant array towards the base array, see halving."""
+    return np.where(mutant < lower_bounds, (lower_bounds + base) / 2, np.where(mutant > upper_bounds, (upper_bounds + base) / 2, mutant))
@@ -4,16 +4,19 @@ import heapq
 import random
 import warnings
 from abc import abstractmethod
-from typing import Tuple, Iterable, Sequence, Callable
+from functools import cached_property
+from typing import Tuple, FrozenSet, Iterable, Sequence, Callable
 from multiprocessing.managers import SyncManager
 
+import numpy as np
+
 from pbt.utils.multiprocessing import Counter
 from pbt.member import Checkpoint, Generation
+from pbt.hyperparameters import HyperparameterPopulation, sample_perturbation
 from pbt.de.mutation import de_rand_1, de_current_to_best_1
-from pbt.de.constraint import halving
+from pbt.de.constraint import halving_array
 from pbt.utils.constraint import clip
-from pbt.utils.distribution import randn, randc, mean_wl
-from pbt.utils.iterable import random_from_list
+from pbt.utils.distribution import randn, randc_truncated, lehmer_mean
 from pbt.fitness import FitnessFunctionProvider
 
 
@@ -23,6 +26,16 @@ def best(members: Iterable[Checkpoint], n: int = 1) -> Sequence[Checkpoint]:
 def worst(members: Iterable[Checkpoint], n: int = 1) -> Sequence[Checkpoint]:
     return heapq.nsmallest(n=n, iterable=members)
 
+def binomial_crossover(base: np.ndarray, mutant: np.ndarray, cr: float, j_rand: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the trial values, which are taken from the mutant in dimension j_rand and where a uniform draw is at most cr, and from the base elsewhere, together with the crossover mask."""
+    crossover = np.random.random(base.shape) <= cr
+    crossover[j_rand] = True
+    return np.where(crossover, mutant, base), crossover
+
+def set_normalized(member: Checkpoint, values: np.ndarray) -> None:
+    """Writes the normalized values to the hyper-parameters of the member, constrained by the constraint of each hyper-parameter."""
+    member.parameters.normalized = values
+
 
 class EvolveFunction(object):
     """
@@ -32,9 +45,12 @@ class EvolveFunction(object):
         self._name = name
         self.verbose = verbose
     
-    def _log(self, text: str) -> None:
+    def _log(self, text: str, *args) -> None:
+        """Prints the text, formatted with the %-style arguments only when verbose."""
         if not self.verbose:
             return
+        if args:
+            text = text % args
         if self._name is None:
             print(text)
         else:
@@ -53,9 +69,12 @@ class EvolutionEngine(object):
         self.verbose = verbose
         self._generation = None
 
-    def _log(self, text: str) -> None:
+    def _log(self, text: str, *args) -> None:
+        """Prints the text, formatted with the %-style arguments only when verbose."""
         if not self.verbose:
             return
+        if args:
+            text = text % args
         if self._name is None:
             print(text)
         else:
@@ -93,6 +112,13 @@ class EvolutionEngine(object):
         """Create initial generation."""
         raise NotImplementedError()
 
+    @staticmethod
+    def _spawn_uniform(members: Iterable[Checkpoint]) -> Generation:
+        """Create initial generation from copies of the members, with the hyper-parameters of all members sampled uniformly in a single draw."""
+        members = [member.copy() for member in members]
+        HyperparameterPopulation.sample_population([member.parameters for member in members])
+        return Generation(members=members)
+
 
 class ExploitAndExplore(EvolutionEngine):
     """
@@ -132,12 +158,7 @@ class ExploitAndExplore(EvolutionEngine):
 
     def spawn(self, members: Iterable[Checkpoint]) -> Generation:
         """Create initial generation."""
-        generation = Generation()
-        for member in members:
-            member = member.copy()
-            [hp.sample_uniform() for hp in member.parameters]
-            generation.append(member)
-        return generation
+        return self._spawn_uniform(members)
 
     class _Evolver(EvolveFunction):
         def __init__(self, generation: Generation, exploit_factor: float, explore_factors: Tuple[float, ...], perturb_method: str, name: str = 'PBT', **kwargs) -> None:
@@ -150,6 +171,17 @@ class ExploitAndExplore(EvolutionEngine):
             self.__exploit_factor = exploit_factor
             self.__explore_factors = explore_factors
             self.__perturb_method = perturb_method
+            self.__n_elitists = max(1, round(len(generation) * exploit_factor))
+
+        @cached_property
+        def __elitist_uids(self) -> Tuple[object, ...]:
+            """The uids of the elitists. The generation is ranked on the first call, after it has been trained, and the ranking is reused for the remaining members."""
+            return tuple(elitist.uid for elitist in best(self.__generation, self.__n_elitists))
+
+        @cached_property
+        def __elitist_uid_set(self) -> FrozenSet[object]:
+            """The uids of the elitists as a set, built from the same ranking as the elitist uids."""
+            return frozenset(self.__elitist_uids)
 
         def __call__(self, member: Checkpoint):
             """
@@ -164,22 +196,21 @@ class ExploitAndExplore(EvolutionEngine):
             return self.__exploit_and_explore(member)
         
         def __exploit_and_explore(self, member):
-            n_elitists = max(1, round(len(self.__generation) * self.__exploit_factor))
-            elitists = best(self.__generation, n_elitists)
             # exploit if member is not elitist
-            if member not in elitists:
-                return self.__exploit(member=member, elitists=elitists)
+            if member.uid not in self.__elitist_uid_set:
+                return self.__exploit(member=member)
             else:
-                self._log(f"member {member.uid} remains itself...")
+                self._log("member %s remains itself...", member.uid)
                 return member
 
-        def __exploit(self, member: Checkpoint, elitists: Sequence[Checkpoint]):
-            elitist = random.choice(elitists)
+        def __exploit(self, member: Checkpoint):
+            elitist = self.__generation[random.choice(self.__elitist_uids)]
             if not elitist.has_state():
-                self._log(f"member {member.uid} remains itself; elitist {elitist.uid} does not have state to share.")
+                self._log("member %s remains itself; elitist %s does not have state to share.", member.uid, elitist.uid)
                 return member
-            self._log(f"member {member.uid} exploits and explores member {elitist.uid}...")
+            self._log("member %s exploits and explores member %s...", member.uid, elitist.uid)
             member.copy_parameters(elitist)
+            # the state is copied, as shared storages would be trained in place by both members in the next generation
             member.copy_state(elitist)
             member.copy_score(elitist)
             self.__explore(member)
@@ -188,17 +219,9 @@ class ExploitAndExplore(EvolutionEngine):
         def __explore(self, member: Checkpoint):
             """Perturb all parameters by the defined explore_factors."""
             assert isinstance(member, Checkpoint)
-            for parameter in member.parameters:
-                perturb_factor = self._get_perturb_factor()
-                parameter *= perturb_factor
-
-        def _get_perturb_factor(self):
-            if self.__perturb_method == 'choice':
-                return random.choice(self.__explore_factors)
-            elif self.__perturb_method == 'sample':
-                return random.uniform(self.__explore_factors[0], self.__explore_factors[1])
-            else:
-                raise NotImplementedError()
+            parameters = member.parameters
+            parameters.normalized = parameters.normalized * sample_perturbation(
+                self.__explore_factors, len(parameters), self.__perturb_method)
 
 
 class DifferentialEvolution(EvolutionEngine):
@@ -232,12 +255,7 @@ class DifferentialEvolution(EvolutionEngine):
 
     def spawn(self, members: Iterable[Checkpoint]) -> Generation:
         """Create initial generation."""
-        generation = Generation()
-        for member in members:
-            member = member.copy()
-            [hp.sample_uniform() for hp in member.parameters]
-            generation.append(member)
-        return generation
+        return self._spawn_uniform(members)
 
     class _Evolver(EvolveFunction):
         def __init__(self, generation: Generation, F: float, Cr: float, fitness_function: Callable[[Checkpoint], None], name: str = 'DE', **kwargs):
@@ -252,6 +270,9 @@ class DifferentialEvolution(EvolutionEngine):
             self._fitness_function = fitness_function
             self.F = F
             self.Cr = Cr
+            # the position of each uid, which lets the donors be sampled by index without filtering the generation
+            self._uids = tuple(member.uid for member in generation)
+            self._indices = {uid: index for index, uid in enumerate(self._uids)}
 
         def __call__(self, member: Checkpoint) -> Checkpoint:
             if not isinstance(member, Checkpoint):
@@ -268,36 +289,39 @@ class DifferentialEvolution(EvolutionEngine):
             # crossover and mutation
             parent = parent.copy()
             dimensions = len(parent.parameters)
-            x_r0, x_r1, x_r2 = random_from_list(self._generation, k=3, exclude=(parent,))
+            x_r0, x_r1, x_r2 = self._sample_donors(parent, k=3)
             j_rand = random.randrange(0, dimensions)
             self._print_mutation_parameters(parent=parent, x_r0=x_r0, x_r1=x_r1, x_r2=x_r2, j_rand=j_rand)
-            self._log(f"generating trial member {parent.uid}")
+            self._log("generating trial member %s", parent.uid)
             trial = parent.copy()
-            for j in range(dimensions):
-                CR_ri = random.uniform(0.0, 1.0)
-                if CR_ri <= self.Cr or j == j_rand:
-                    self._log(f"M{parent.uid}: crossover in dimension {j} with CR_ri {CR_ri:.4f}")
-                    mutant = de_rand_1(F=self.F, x_r0=x_r0[j], x_r1=x_r1[j], x_r2=x_r2[j])
-                    constrained = clip(mutant, 0.0, 1.0)
-                    trial[j] = constrained
-                    self._log(f"M{parent.uid}: mutant value {mutant:.4f}, constrained to {constrained:.4f}")
-                else:
-                    trial[j] = parent[j]
+            x, x_0, x_1, x_2 = HyperparameterPopulation(
+                [parent.parameters, x_r0.parameters, x_r1.parameters, x_r2.parameters]).values
+            mutant = np.clip(de_rand_1(F=self.F, x_r0=x_0, x_r1=x_1, x_r2=x_2), 0.0, 1.0)
+            trial_values, crossover = binomial_crossover(base=x, mutant=mutant, cr=self.Cr, j_rand=j_rand)
+            if self.verbose:
+                self._log("M%s: crossover in dimensions %s", parent.uid, np.flatnonzero(crossover).tolist())
+            set_normalized(trial, trial_values)
             # measure fitness
-            self._log(f"M{parent.uid}: measuring fitness score of parent and trial")
+            self._log("M%s: measuring fitness score of parent and trial", parent.uid)
             self._fitness_function(parent)
             self._fitness_function(trial)
             # select best
-            self._log(f"M{parent.uid}: selecting between evaluated parent and trial")
+            self._log("M%s: selecting between evaluated parent and trial", parent.uid)
             return self._select(parent, trial)
 
+        def _sample_donors(self, member: Checkpoint, k: int) -> Tuple[Checkpoint, ...]:
+            """Sample k distinct members from the generation, other than the member. The indices after the member are shifted past it."""
+            member_index = self._indices[member.uid]
+            indices = random.sample(range(len(self._uids) - 1), k)
+            return tuple(self._generation[self._uids[index + 1 if index >= member_index else index]] for index in indices)
+
         def _select(self, parent: Checkpoint, trial: Checkpoint) -> Checkpoint:
             """Evaluates candidate, compares it to the base and returns the best performer."""
             if parent <= trial:
-                self._log(f"M{parent.uid}: mutate member (x {parent.eval_score():.4f} <= u {trial.eval_score():.4f}).")
+                self._log("M%s: mutate member (x %.4f <= u %.4f).", parent.uid, parent.eval_score(), trial.eval_score())
                 return trial
             else:
-                self._log(f"M{parent.uid}: maintain member (x {parent.eval_score():.4f} > u {trial.eval_score():.4f}).")
+                self._log("M%s: maintain member (x %.4f > u %.4f).", parent.uid, parent.eval_score(), trial.eval_score())
                 return parent
         
         def _print_mutation_parameters(self, parent, x_r0, x_r1, x_r2, j_rand):
@@ -323,8 +347,9 @@ class HistoricalMemory(object):
         if not isinstance(default, float):
             raise TypeError(f"the 'default' specified was of wrong type {type(default)}, expected {float}.")
         self.size = size
-        self.m_cr = [default] * size
-        self.m_f = [default] * size
+        # a terminal crossover rate is marked with NaN
+        self.m_cr = np.full(size, default, dtype=np.float64)
+        self.m_f = np.full(size, default, dtype=np.float64)
         self.__lock = manager.Lock()
         self.__s_cr = manager.list()
         self.__s_f = manager.list()
@@ -359,14 +384,18 @@ class HistoricalMemory(object):
 
     def update(self) -> None:
         with self.__lock:
-            assert len(self.__s_cr) == len(self.__s_f) == len(self.__s_w), "the lengths of __s_cr, __s_f and __s_weights are not equal."
-            if len(self.__s_cr) == 0:
+            # fetch the successful parameters from the manager at once
+            s_cr = np.array(self.__s_cr[:], dtype=np.float64)
+            s_f = np.array(self.__s_f[:], dtype=np.float64)
+            s_w = np.array(self.__s_w[:], dtype=np.float64)
+            assert len(s_cr) == len(s_f) == len(s_w), "the lengths of __s_cr, __s_f and __s_weights are not equal."
+            if len(s_cr) == 0:
                 return
-            if self.m_cr[self.__k] == None or max(self.__s_cr) == 0.0:
-                self.m_cr[self.__k] = None
+            if np.isnan(self.m_cr[self.__k]) or s_cr.max() == 0.0:
+                self.m_cr[self.__k] = np.nan
             else:
-                self.m_cr[self.__k] = mean_wl(self.__s_cr, self.__s_w)
-            self.m_f[self.__k] = mean_wl(self.__s_f, self.__s_w)
+                self.m_cr[self.__k] = lehmer_mean(s_cr, s_w)
+            self.m_f[self.__k] = lehmer_mean(s_f, s_w)
             self.__k = 0 if self.__k >= self.size - 1 else self.__k + 1
 
 
@@ -388,19 +417,30 @@ class ExternalArchive():
         with self.__lock:
             return list(self.__records)
 
-    def __print(self, message: str):
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def __getitem__(self, index: int) -> Checkpoint:
+        return self.__records[index]
+
+    def __print(self, message: str, *args):
         if not self.verbose:
             return
+        if args:
+            message = message % args
         print(f"ExternalArchive: {message}")
 
     def __random_delete(self, n: int = 1):
         assert n >= 0, "n is negative!"
         assert n <= len(self.__records), "attempted to remove too many values"
+        # the records are fetched and stored with one call each, and every removal swaps the last record into the removed slot
+        records = self.__records[:]
         for _ in range(n):
-            random_value = random.choice(self.__records)
-            index = self.__records.index(random_value)
-            self.__print(f"removing random {random_value} at index {index} from archive.")
-            self.__records.remove(random_value)
+            index = random.randrange(len(records))
+            self.__print("removing random %s at index %d from archive.", records[index], index)
+            records[index] = records[-1]
+            records.pop()
+        self.__records[:] = records
 
     def resize(self, size: int):
         if not isinstance(size, int):
@@ -423,11 +463,18 @@ class ExternalArchive():
         if parent in self.__records:
             raise ValueError("checkpoint already exists in archive.")
         with self.__lock:
-            self.__print(f"appending {parent} to archive of size {len(self.__records)}")
-            if len(self.__records) == self.__size.value:
-                self.__random_delete(n=1)
+            if self.verbose:
+                self.__print("appending %s to archive of size %d", parent, len(self.__records))
             parent.delete_state() # remove useless state
-            self.__records.append(parent)
+            if self.__size.value == 0:
+                return
+            if len(self.__records) == self.__size.value:
+                # a full archive replaces a random record
+                index = random.randrange(self.__size.value)
+                self.__print("replacing random record at index %d in archive.", index)
+                self.__records[index] = parent
+            else:
+                self.__records.append(parent)
 
     def clear(self) -> None:
         """Clear records"""
@@ -514,12 +561,7 @@ class SHADE(EvolutionEngine):
         
     def spawn(self, members: Iterable[Checkpoint]) -> Generation:
         """Create initial generation."""
-        generation = Generation()
-        for member in members:
-            member = member.copy()
-            [hp.sample_uniform() for hp in member.parameters]
-            generation.append(member)
-        return generation
+        return self._spawn_uniform(members)
 
     class _Evolver(EvolveFunction):
         def __init__(self, generation: Generation, fitness_function: Callable[[Checkpoint], None], memory: HistoricalMemory, archive: ExternalArchive, p: float, f_min:float, f_max: float, state_sharing: bool, name: str = 'SHADE', **kwargs):
@@ -538,6 +580,13 @@ class SHADE(EvolutionEngine):
             self.F_MIN = f_min
             self.F_MAX = f_max
             self.state_sharing = state_sharing
+            self._uids = tuple(member.uid for member in generation)
+            self._n_pbest = max(1, round(len(generation) * p))
+
+        @cached_property
+        def _pbest_uids(self) -> Tuple[object, ...]:
+            """The uids of the top members. The generation is ranked on the first call, after it has been trained, and the ranking is reused for the remaining members."""
+            return tuple(elitist.uid for elitist in best(self._generation, self._n_pbest))
 
         def __call__(self, member: Checkpoint) -> Checkpoint:
             if not isinstance(member, Checkpoint):
@@ -567,41 +616,38 @@ class SHADE(EvolutionEngine):
             # make a copy of the member
             trial = parent.copy()
             if self.state_sharing:
-                self._log(f"M{parent.uid}: copying state from x_pbest member {x_pbest.uid}")
+                self._log("M%s: copying state from x_pbest member %s", parent.uid, x_pbest.uid)
                 trial.copy_state(x_pbest)
-            self._log(f"M{parent.uid}: generating trial member")
-            for j in range(dimensions):
-                CR_ri = random.uniform(0.0, 1.0)
-                if CR_ri <= CR_i or j == j_rand:
-                    self._log(f"M{parent.uid}: crossover in dimension {j} with CR_ri {CR_ri:.4f}")
-                    mutant = de_current_to_best_1(F=F_i, x_base=parent[j], x_best=x_pbest[j], x_r1=x_r1[j], x_r2=x_r2[j])
-                    constrained = halving(base=parent[j], mutant=mutant, lower_bounds=0.0, upper_bounds=1.0)
-                    trial[j] = constrained
-                    self._log(f"M{parent.uid}: mutant value {mutant:.4f}, constrained to {constrained:.4f}")
-                else:
-                    trial[j] = parent[j]
+            self._log("M%s: generating trial member", parent.uid)
+            x, x_best, x_1, x_2 = HyperparameterPopulation(
+                [parent.parameters, x_pbest.parameters, x_r1.parameters, x_r2.parameters]).values
+            mutant = de_current_to_best_1(F=F_i, x_base=x, x_best=x_best, x_r1=x_1, x_r2=x_2)
+            constrained = halving_array(base=x, mutant=mutant, lower_bounds=0.0, upper_bounds=1.0)
+            trial_values, crossover = binomial_crossover(base=x, mutant=constrained, cr=CR_i, j_rand=j_rand)
+            if self.verbose:
+                self._log("M%s: crossover in dimensions %s", parent.uid, np.flatnonzero(crossover).tolist())
+            set_normalized(trial, trial_values)
             # measure fitness
-            self._log(f"M{parent.uid}: measuring fitness score of parent and trial")
+            self._log("M%s: measuring fitness score of parent and trial", parent.uid)
             self._fitness_function(parent)
             self._fitness_function(trial)
             # select
-            self._log(f"M{parent.uid}: selecting between measured parent and trial")
+            self._log("M%s: selecting between measured parent and trial", parent.uid)
             return self._select(parent, trial, CR_i, F_i)
 
         def _select(self, parent: Checkpoint, trial: Checkpoint, CR_i: float, F_i: float) -> Checkpoint:
             """Evaluates candidate, compares it to the original member and returns the best performer."""
             if parent <= trial:
                 if parent < trial:
-                    self._log(f"M{parent.uid}: adding parent to archive.")
+                    self._log("M%s: adding parent to archive.", parent.uid)
                     self._archive.append(parent.copy())
                     w_i = abs(trial.eval_score() - parent.eval_score())
-                    self._log(f"M{parent.uid}: recording CR_i {CR_i:.4f} and F_i {F_i:.4f} with w_i {w_i:.4E} to historical memory.")
+                    self._log("M%s: recording CR_i %.4f and F_i %.4f with w_i %.4E to historical memory.", parent.uid, CR_i, F_i, w_i)
                     self._memory.record(CR_i, F_i, w_i)
-                self._log(f"M{parent.uid}: mutate member (x {parent.eval_score():.4f} < u {trial.eval_score():.4f}).")
+                self._log("M%s: mutate member (x %.4f < u %.4f).", parent.uid, parent.eval_score(), trial.eval_score())
                 return trial
             else:
-                self._log(
-                    f"M{parent.uid}: maintain member (x {parent.eval_score():.4f} > u {trial.eval_score():.4f}).")
+                self._log("M%s: maintain member (x %.4f > u %.4f).", parent.uid, parent.eval_score(), trial.eval_score())
                 return parent
 
         def _get_control_parameters(self) -> Tuple[float, float]:
@@ -610,40 +656,54 @@ class SHADE(EvolutionEngine):
             of mean μCR and standard deviation 0.1 and then truncated to [0, 1].
 
             The mutation factor Fi is generated according to a Cauchy distribution
-            with location parameter μF and scale parameter 0.1 and then
-            truncated to be 1 if Fi >= 1 or regenerated if Fi <= 0.
+            with location parameter μF and scale parameter 0.1, truncated below at F_MIN,
+            and then truncated to be F_MAX if Fi >= F_MAX.
             """
-            # select random from memory
-            r1 = random.randrange(0, self._memory.size)
-            MF_i = self._memory.m_f[r1]
-            MCR_i = self._memory.m_cr[r1]
+            # select random from memory, which is looked up once
+            memory = self._memory
+            r1 = random.randrange(memory.size)
+            MF_i = float(memory.m_f[r1])
+            MCR_i = float(memory.m_cr[r1])
             assert not math.isnan(MF_i), "MF_i is NaN."
-            assert not math.isnan(MCR_i), "MCR_i is NaN."
-            # generate MCR_i
-            if MCR_i == None:
+            # generate MCR_i, which is NaN when the crossover rate is terminal
+            if math.isnan(MCR_i):
                 CR_i = 0.0
             else:
                 CR_i = clip(randn(MCR_i, 0.1), 0.0, 1.0)
-            # generate MF_i
-            while True:
-                F_i = randc(MF_i, 0.1)
-                if F_i < self.F_MIN:
-                    continue
-                if F_i > self.F_MAX:
-                    F_i = self.F_MAX
-                break
+            # generate MF_i, where values below F_MIN are never sampled instead of regenerated
+            F_i = min(randc_truncated(MF_i, 0.1, self.F_MIN), self.F_MAX)
             return CR_i, F_i
 
         def _sample_r1_and_r2(self, member: Checkpoint) -> Tuple[Checkpoint, Checkpoint]:
-            x_r1 = random_from_list(list(self._generation), k=1, exclude=(member,))
-            x_r2 = random_from_list(self._archive.records + list(self._generation), k=1, exclude=(member, x_r1))
-            return x_r1, x_r2
+            """
+            Sample x_r1 from the generation and x_r2 from the union of the archive and the generation, both distinct from the member and each other.
+            The union is indexed virtually, with the archive first, and only the sampled members are fetched.
+            """
+            uids = self._uids
+            r1_uids = [uid for uid in uids if uid != member.uid]
+            if not r1_uids:
+                raise ValueError("generation size must be at least 2 or higher")
+            x_r1_uid = random.choice(r1_uids)
+            x_r1 = self._generation[x_r1_uid]
+            r2_uids = [uid for uid in r1_uids if uid != x_r1_uid]
+            n_archived = len(self._archive)
+            if not r2_uids and n_archived == 0:
+                raise ValueError("generation size must be at least 3 or higher when the archive is empty")
+            # the archived members are rejected a bounded number of times, as the archive may only hold copies of the member and x_r1
+            for _ in range(n_archived + len(uids)):
+                index = random.randrange(n_archived + len(r2_uids))
+                if index >= n_archived:
+                    return x_r1, self._generation[r2_uids[index - n_archived]]
+                x_r2 = self._archive[index]
+                if x_r2 != member and x_r2 != x_r1:
+                    return x_r1, x_r2
+            if not r2_uids:
+                raise ValueError("the archive holds no member distinct from the member and x_r1")
+            return x_r1, self._generation[random.choice(r2_uids)]
 
         def _sample_pbest_member(self) -> Checkpoint:
             """Sample a random top member from the popualtion."""
-            n_elitists = max(1, round(len(self._generation) * self.p))
-            elitists = best(self._generation, n_elitists)
-            return random.choice(elitists)
+            return self._generation[random.choice(self._pbest_uids)]
 
         def _print_mutation_parameters(self, parent, CR_i, F_i, x_r1, x_r2, x_pbest, j_rand):
             if not self.verbose:
@@ -696,16 +756,16 @@ class LSHADE(SHADE):
     def _adjust_generation_size(self, generation: Generation):
         new_size = round(((self.N_MIN - self.N_INIT) / self.MAX_NFE) * self._nfe.value + self.N_INIT)
         if new_size >= len(generation):
-            self._log(f"no reduction in generation size needed.")
+            self._log("no reduction in generation size needed.")
             return
-        self._log(f"adjusting generation size {len(generation)} --> {new_size}")
+        self._log("adjusting generation size %d --> %d", len(generation), new_size)
         # adjust archive size |A| according to |P|
         self._archive.resize(round(new_size * self.r_arc))
         # remove Delta-N worst members
         size_delta = len(generation) - new_size
         for member in worst(generation, size_delta):
             generation.remove(member)
-            self._log(f"member {member.uid} with score {member.eval_score():.4f} was removed from the generation.")
+            self._log("member %s with score %.4f was removed from the generation.", member.uid, member.eval_score())
 
     class _Evolver(SHADE._Evolver):
         def __init__(self, nfe_counter: Counter, name: str = 'LSHADE', **kwargs) -> None:
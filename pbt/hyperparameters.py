@@ -4,14 +4,20 @@ import math
 import copy
 import warnings
 from functools import partial
-from typing import Dict, Union, Tuple, Iterable, TypeVar
+from typing import Dict, Union, Tuple, Iterable, Sequence, Callable, TypeVar
 from abc import abstractmethod
 
+import numpy as np
+
 from .utils.constraint import translate, clip, reflect
-from .utils.iterable import value_by_fraction
 
 HP_TYPE = TypeVar('ParameterType')
 
+# constraint functions are shared by all hyperparameters and bound once on import
+CONSTRAINTS: Dict[str, Callable[[float], float]] = {
+    'clip': partial(clip, min_value=0.0, max_value=1.0),
+    'reflect': partial(reflect, min_value=0.0, max_value=1.0)}
+
 class InvalidSearchSpaceException(Exception):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -25,19 +31,46 @@ class _Hyperparameter(object):
         Provide a set of [lower bound, upper bound] as float/int, or categorical elements [obj1, obj2, ..., objn].
         Sets the search space and samples a new candidate from an uniform distribution.
         '''
-        if args == None:
+        if not args:
             raise ValueError("No arguments provided.")
         if not isinstance(constraint, str):
             raise TypeError(f"the 'constraint' specified was of wrong type {type(constraint)}, expected {str}.")
         self.MIN_NORM: float = 0.0
         self.MAX_NORM: float = 1.0
         self.set_constraint(constraint)
-        self.search_space: Tuple[HP_TYPE, ...] = tuple(args)
-        self._normalized = self.from_value(value) if value is not None else random.uniform(self.MIN_NORM, self.MAX_NORM)
+        self.search_space: Tuple[HP_TYPE, ...] = args
+        self._cache_search_space()
+        self._normalized = self.from_value(value) if value is not None else random.random()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # named constraints are looked up again on unpickling instead of being serialized with every copy
+        if isinstance(self.constraint, str):
+            del state['_constrain']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if '_constrain' not in state:
+            self._constrain = CONSTRAINTS[self.constraint]
+        self._cache_search_space()
 
     def __repr__(self):
         return repr(self.value)
 
+    def __deepcopy__(self, memo: dict):
+        return self.clone()
+
+    def clone(self):
+        """Returns a copy of the hyperparameter. The attributes are immutable, so they are shared instead of copied."""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+    def _cache_search_space(self) -> None:
+        """Precomputes the scalars derived from the search space, which is constant after initialization."""
+        pass
+
     def _translate_from_norm(self, normalized_value: float) -> HP_TYPE:
         return translate(normalized_value, self.MIN_NORM, self.MAX_NORM, self.lower_bound, self.upper_bound)
     
@@ -45,13 +78,11 @@ class _Hyperparameter(object):
         return translate(value, self.lower_bound, self.upper_bound, self.MIN_NORM, self.MAX_NORM)
 
     def set_constraint(self, constraint: str) -> None:
+        self.constraint = constraint
         if isinstance(constraint, str):
-            if constraint == 'clip':
-                self._constrain = partial(clip, min_value=self.MIN_NORM, max_value=self.MAX_NORM)
-            elif constraint == 'reflect':
-                self._constrain = partial(reflect, min_value=self.MIN_NORM, max_value=self.MAX_NORM)
-            else:
+            if constraint not in CONSTRAINTS:
                 raise NotImplementedError(f"No constraint matches '{constraint}'")
+            self._constrain = CONSTRAINTS[constraint]
         elif callable(constraint):
             self._constrain = partial(constraint, min_value=self.MIN_NORM, max_value=self.MAX_NORM)
         else:
@@ -103,106 +134,56 @@ class _Hyperparameter(object):
 
     def sample_uniform(self) -> None:
         ''' Samples a new candidate from an uniform distribution bound by the lower and upper bounds. '''
-        self._normalized = random.uniform(self.MIN_NORM, self.MAX_NORM)
+        self._normalized = random.random()
 
     def equal_search_space(self, other) -> bool:
         """Return true if the search space is equal."""
         return isinstance(other, self.__class__) and self.search_space == other.search_space
 
+    def _operand(self, other: Union[int, float, HP_TYPE], operation: str) -> Union[int, float]:
+        """Returns the normalized value of other if it is a hyperparameter of the same type and search space, or other itself if it is a float or int."""
+        if type(other) is type(self) or isinstance(other, self.__class__):
+            if self.search_space != other.search_space:
+                raise ValueError(f"{operation} is not supported for hyperparameters of unequal search spaces.")
+            return other._normalized
+        if isinstance(other, (float, int)):
+            return other
+        raise TypeError(f"{operation} is only supported for values of type {self.__class__}, {float} or {int}.")
+
     def __add__(self, other: Union[int, float, HP_TYPE]):
-        new_hp = copy.deepcopy(self)
-        if isinstance(other, self.__class__):
-            if not new_hp.equal_search_space(other):
-                raise ValueError("Addition is not supported for hyperparameters of unequal search spaces.")
-            new_hp._normalized = self._constrain(new_hp._normalized + other._normalized)
-            return new_hp
-        elif isinstance(other, (float, int)):
-            new_hp._normalized = self._constrain(new_hp._normalized + other)
-            return new_hp
-        else:
-            raise TypeError(f"Addition is only supported for values of type {self.__class__}, {float} or {int}.")
+        new_hp = self.clone()
+        new_hp._normalized = self._constrain(self._normalized + self._operand(other, "Addition"))
+        return new_hp
 
     def __sub__(self, other: Union[int, float, HP_TYPE]):
-        new_hp = copy.deepcopy(self)
-        if isinstance(other, self.__class__):
-            if not new_hp.equal_search_space(other):
-                raise ValueError("Subtraction is not supported for hyperparameters of unequal search spaces.")
-            new_hp._normalized = self._constrain(new_hp._normalized - other._normalized)
-            return new_hp
-        elif isinstance(other, (float, int)):
-            new_hp._normalized = self._constrain(new_hp._normalized - other)
-            return new_hp
-        else:
-            raise TypeError(f"Subtraction is only supported for values of type {self.__class__}, {float} or {int}.")
+        new_hp = self.clone()
+        new_hp._normalized = self._constrain(self._normalized - self._operand(other, "Subtraction"))
+        return new_hp
 
     def __mul__(self, other: Union[int, float, HP_TYPE]):
-        new_hp = copy.deepcopy(self)
-        if isinstance(other, self.__class__):
-            if not new_hp.equal_search_space(other):
-                raise ValueError("Multiplication is not supported for hyperparameters of unequal search spaces.")
-            new_hp._normalized = self._constrain(new_hp._normalized * other._normalized)
-            return new_hp
-        elif isinstance(other, (float, int)):
-            new_hp._normalized = self._constrain(new_hp._normalized * other)
-            return new_hp
-        else:
-            raise TypeError(f"Multiplication is only supported for values of type {self.__class__}, {float} or {int}.")
+        new_hp = self.clone()
+        new_hp._normalized = self._constrain(self._normalized * self._operand(other, "Multiplication"))
+        return new_hp
 
     def __truediv__(self, other: Union[int, float, HP_TYPE]):
-        new_hp = copy.deepcopy(self)
-        if isinstance(other, self.__class__):
-            if not new_hp.equal_search_space(other):
-                raise ValueError("Divition is not supported for hyperparameters of unequal search spaces.")
-            new_hp._normalized = self._constrain(new_hp._normalized / other._normalized)
-            return new_hp
-        elif isinstance(other, (float, int)):
-            new_hp._normalized = self._constrain(new_hp._normalized / other)
-            return new_hp
-        else:
-            raise TypeError(f"Divition is only supported for values of type {self.__class__}, {float} or {int}.")
+        new_hp = self.clone()
+        new_hp._normalized = self._constrain(self._normalized / self._operand(other, "Divition"))
+        return new_hp
 
     def __iadd__(self, other: Union[int, float, HP_TYPE]):
-        if isinstance(other, self.__class__):
-            if not self.equal_search_space(other):
-                raise ValueError("Addition is not supported for hyperparameters of unequal search spaces.")
-            self._normalized = self._constrain(self._normalized + other._normalized)
-        elif isinstance(other, (float, int)):
-            self._normalized = self._constrain(self._normalized + other)
-        else:
-            raise TypeError(f"Addition is only supported for values of type {self.__class__}, {float} or {int}.")
+        self._normalized = self._constrain(self._normalized + self._operand(other, "Addition"))
         return self
 
     def __isub__(self, other: Union[int, float, HP_TYPE]):
-        if isinstance(other, self.__class__):
-            if not self.equal_search_space(other):
-                raise ValueError("Subtraction is not supported for hyperparameters of unequal search spaces.")
-            self._normalized = self._constrain(self._normalized - other._normalized)
-        elif isinstance(other, (float, int)):
-            self._normalized = self._constrain(self._normalized - other)
-        else:
-            raise TypeError(f"Subtraction is only supported for values of type {self.__class__}, {float} or {int}.")
+        self._normalized = self._constrain(self._normalized - self._operand(other, "Subtraction"))
         return self
 
     def __imul__(self, other: Union[int, float, HP_TYPE]):
-        if isinstance(other, self.__class__):
-            if not self.equal_search_space(other):
-                raise ValueError("Multiplication is not supported for hyperparameters of unequal search spaces.")
-            self._normalized = self._constrain(self._normalized * other._normalized)
-        elif isinstance(other, (float, int)):
-            self._normalized = self._constrain(self._normalized * other)
-        else:
-            raise TypeError(f"Multiplication is only supported for values of type {self.__class__}, {float} or {int}.")
+        self._normalized = self._constrain(self._normalized * self._operand(other, "Multiplication"))
         return self
 
     def __idiv__(self, other: Union[int, float, HP_TYPE]):
-        if isinstance(other, self.__class__):
-            if not self.equal_search_space(other):
-                raise ValueError("Divition is not supported for hyperparameters of unequal search spaces.")
-            self._normalized = self._constrain(self._normalized / other._normalized)
-        elif isinstance(other, (float, int)):
-            self._normalized = self._constrain(self._normalized / other)
-        else:
-            raise TypeError(f"Divition is only supported for values of type {self.__class__}, {float} or {int}.")
+        self._normalized = self._constrain(self._normalized / self._operand(other, "Divition"))
         return self
 
     def __lt__(self, other: self.__class__):
@@ -274,33 +255,33 @@ class ContiniousHyperparameter(_Hyperparameter):
             warnings.warn(f"The value {value} is outside the search space U({self.lower_bound}, {self.upper_bound}). The value will be constrained.")
         self._normalized = self._constrain(self.from_value(value))
 
+    def _cache_search_space(self) -> None:
+        self._lower = self.search_space[0]
+        self._upper = self.search_space[-1]
+        self._span = self._upper - self._lower
+        self._is_float = isinstance(self._lower, float)
+
     @property
     def lower_bound(self) -> Union[int, float]:
         ''' Returns the lower bounds of the hyper-parameter search space. If categorical, return the first search space index. '''
-        return self.search_space[0]
+        return self._lower
 
     @property 
     def upper_bound(self) -> Union[int, float]:
         ''' Returns the upper bounds of the hyper-parameter search space. If categorical, return the last search space index. '''
-        return self.search_space[-1]
+        return self._upper
 
     def from_value(self, value: Union[int, float]) -> float:
         """Returns a normalized version of the provided value."""
         if isinstance(value, (int, float)):
-            return self._translate_from_value(value)
+            return (value - self._lower) / self._span
         else:
             raise Exception(f"Non-categorical hyperparameters must be of type {float} or {int}.")
 
     def from_normalized(self, normalized_value: float) -> Union[int, float]:
         """Returns a search space value from the provided normalized value."""
-        constrained = self._constrain(normalized_value)
-        trainslated = self._translate_from_norm(constrained)
-        if isinstance(self.search_space[0], float):
-            return float(trainslated)
-        elif isinstance(self.search_space[0], int):
-            return int(round(trainslated))
-        else:
-            raise Exception(f"Non-categorical hyperparameters must be of type {float} or {int}.")
+        translated = self._lower + self._constrain(normalized_value) * self._span
+        return float(translated) if self._is_float else int(round(translated))
 
 class DiscreteHyperparameter(_Hyperparameter):
     def __init__(self, *search_space: Iterable[HP_TYPE], value: HP_TYPE = None, constraint: str = 'clip'):
@@ -324,10 +305,18 @@ class DiscreteHyperparameter(_Hyperparameter):
     @value.setter
     def value(self, value: HP_TYPE):
         """Sets the hyperparameter value."""
-        if value not in self.search_space:
-            raise ValueError("The provided value must be present in the categorical search space.")
         self._normalized = self._constrain(self.from_value(value))
 
+    def _cache_search_space(self) -> None:
+        self._n_cat = len(self.search_space)
+        self._cat_to_index = dict()
+        for index, value in enumerate(self.search_space):
+            self._cat_to_index.setdefault(value, index)
+        # fraction of the normalized range covered by each category
+        self._cat_fraction = 1 / self._n_cat + 1e-9
+        # normalized position of each category index
+        self._index_to_normalized = tuple(index / (self._n_cat - 1) if self._n_cat > 1 else 0.0 for index in range(self._n_cat))
+
     @property
     def lower_bound(self) -> int:
         ''' Returns the lower bounds of the hyper-parameter search space. For categorical, it returns the first search space index. '''
@@ -336,18 +325,18 @@ class DiscreteHyperparameter(_Hyperparameter):
     @property 
     def upper_bound(self) -> int:
         ''' Returns the upper bounds of the hyper-parameter search space. For categorical, it returns the last search space index. '''
-        return len(self.search_space) - 1
+        return self._n_cat - 1
 
     def from_value(self, value: HP_TYPE) -> float:
         """Returns a normalized version of the provided value."""
-        assert value in self.search_space, f"The provided value {value} does not exist within the categorical search space."
-        index = self.search_space.index(value)
-        return self._translate_from_value(index)
+        index = self._cat_to_index.get(value)
+        if index is None:
+            raise ValueError(f"The provided value {value} does not exist within the categorical search space.")
+        return self._index_to_normalized[index]
 
     def from_normalized(self, normalized_value: float) -> HP_TYPE:
         """Returns a search space value from the provided normalized value."""
-        constrained = self._constrain(normalized_value)
-        return value_by_fraction(self.search_space, constrained)
+        return self.search_space[int(self._constrain(normalized_value) / self._cat_fraction)]
 
     def equal_search_space(self, other) -> bool:
         return isinstance(other, self.__class__) and super().equal_search_space(other)
@@ -397,6 +386,16 @@ class Hyperparameters(object):
     def __str__(self) -> str:
         return ''.join(f"{hp_name}: {hp_value}\n" for hp_name, hp_value in self.items())
 
+    def __deepcopy__(self, memo: dict):
+        return self.clone()
+
+    def clone(self) -> Hyperparameters:
+        """Returns a copy of the hyperparameters, with each hyperparameter cloned instead of deep-copied."""
+        clone = self.__class__.__new__(self.__class__)
+        for group_name, group_dict in self.__dict__.items():
+            setattr(clone, group_name, {hp_name: hp_value.clone() for hp_name, hp_value in group_dict.items()})
+        return clone
+
     def __eq__(self, other) -> bool:
         if not hasattr(other, '__iter__'):
             return False
@@ -450,6 +449,22 @@ class Hyperparameters(object):
             return
         raise ValueError("Key types supported are integer or string of syntax 'param_group/param_name'.")
 
+    @property
+    def normalized(self) -> np.ndarray:
+        """Returns the normalized values of all hyperparameters as an array of shape (K,)."""
+        return np.fromiter((hp._normalized for hp in self), dtype=np.float64, count=len(self))
+
+    @normalized.setter
+    def normalized(self, values: np.ndarray) -> None:
+        """Sets the normalized values of all hyperparameters, constrained by the constraint of each hyperparameter."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (len(self),):
+            raise ValueError(f"values must be of shape {(len(self),)}, got {values.shape}.")
+        if not np.isfinite(values).all():
+            raise ValueError("values must be finite.")
+        for hp, value in zip(self, values.tolist()):
+            hp._normalized = hp._constrain(value)
+
     def items(self, full_key: bool = False):
         if not full_key:
             for groups in self.__dict__.values():
@@ -485,6 +500,98 @@ class Hyperparameters(object):
             for hp_name, hp_value in group_dict.items():
                 yield (f"{group_name}/{hp_name}", hp_value)
 
+def sample_perturbation(factors: Sequence[float], shape: Union[int, Tuple[int, ...]], method: str = 'choice') -> np.ndarray:
+    ''' Draws all perturbation factors of the given shape at once, either chosen from the factors or sampled uniformly between the first two. '''
+    if method == 'choice':
+        return np.random.choice(factors, size=shape)
+    elif method == 'sample':
+        return np.random.uniform(factors[0], factors[1], size=shape)
+    else:
+        raise NotImplementedError(f"No perturb method matches '{method}'")
+
+class HyperparameterPopulation(object):
+    '''
+    Structure-of-arrays view of the normalized hyperparameters of a population.
+    Rows correspond to members and columns to hyperparameters, which allows the population to be sampled,
+    updated and constrained with single array operations. Call apply() to write the values back to the members.
+    '''
+    def __init__(self, members: Sequence[Hyperparameters]):
+        if not members:
+            raise ValueError("At least one member is required.")
+        self.members = list(members)
+        template = list(self.members[0])
+        self.keys: Tuple[str, ...] = tuple(self.members[0].keys())
+        self.values = np.array([[hp.normalized for hp in member] for member in self.members], dtype=np.float64)
+        if self.values.shape != (len(self.members), len(template)):
+            raise ValueError("All members must have the same hyperparameter configuration.")
+        self.lower = np.array([hp.lower_bound for hp in template], dtype=np.float64)
+        self.upper = np.array([hp.upper_bound for hp in template], dtype=np.float64)
+        self.is_cat = np.array([isinstance(hp, DiscreteHyperparameter) for hp in template], dtype=bool)
+        self.is_int = np.array([not isinstance(hp, DiscreteHyperparameter) and isinstance(hp.lower_bound, int) for hp in template], dtype=bool)
+        self.cat_sizes = np.array([len(hp.search_space) if isinstance(hp, DiscreteHyperparameter) else 0 for hp in template], dtype=np.int64)
+        self.search_spaces = tuple(hp.search_space for hp in template)
+        self.constraints = tuple(hp.constraint for hp in template)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    @classmethod
+    def sample_population(cls, members: Sequence[Hyperparameters]) -> HyperparameterPopulation:
+        ''' Samples new candidates for all provided members with a single draw and writes them back. '''
+        population = cls(members)
+        population.sample_uniform()
+        population.apply()
+        return population
+
+    def sample_uniform(self) -> None:
+        ''' Samples new candidates for the whole population from an uniform distribution. '''
+        self.values = np.random.random(self.values.shape)
+
+    def constrain(self) -> None:
+        ''' Constrains the normalized values column-wise by the constraint of each hyperparameter. '''
+        for column, constraint in enumerate(self.constraints):
+            if constraint == 'clip':
+                np.clip(self.values[:, column], 0.0, 1.0, out=self.values[:, column])
+            elif constraint == 'reflect':
+                # reflecting on the bounds of [0, 1] is a triangle wave with a period of two
+                self.values[:, column] = 1.0 - np.abs(np.mod(self.values[:, column], 2.0) - 1.0)
+            else:
+                hp_constrain = partial(constraint, min_value=0.0, max_value=1.0)
+                self.values[:, column] = [hp_constrain(value) for value in self.values[:, column]]
+
+    def update(self, expression: Callable[[np.ndarray], np.ndarray]) -> None:
+        ''' Replaces the normalized values with the result of the provided expression and constrains them. '''
+        self.values = np.asarray(expression(self.values), dtype=np.float64)
+        self.constrain()
+
+    def perturb(self, factors: Sequence[float], method: str = 'choice') -> None:
+        ''' Multiplies every normalized value by a random factor and constrains the result. '''
+        perturbation = sample_perturbation(factors, self.values.shape, method)
+        self.update(lambda values: values * perturbation)
+
+    def denormalize(self) -> np.ndarray:
+        ''' Returns an object array of shape (N, K) with the search space values of the population. '''
+        numeric = self.lower + self.values * (self.upper - self.lower)
+        numeric[:, self.is_int] = np.rint(numeric[:, self.is_int])
+        result = numeric.astype(object)
+        for column in np.flatnonzero(self.is_int):
+            result[:, column] = [int(value) for value in numeric[:, column]]
+        for column in np.flatnonzero(self.is_cat):
+            search_space = self.search_spaces[column]
+            indices = (self.values[:, column] / (1 / len(search_space) + 1e-9)).astype(np.int64)
+            result[:, column] = [search_space[index] for index in indices]
+        return result
+
+    def apply(self) -> None:
+        ''' Writes the normalized values back to the hyperparameters of each member. '''
+        for member, row in zip(self.members, self.values.tolist()):
+            for hp, normalized in zip(member, row):
+                hp._normalized = normalized
+
 def hyper_parameter_change_details(old_hps: Hyperparameters, new_hps: Hyperparameters) -> str:
     entries = list()
     for key in old_hps.keys():
@@ -1,10 +1,12 @@
 from __future__ import annotations
 import copy
+import copyreg
 import math
 import warnings
 from datetime import datetime
 from typing import Dict, Iterable, Iterator
 
+import numpy as np
 import torch
 
 from .hyperparameters import Hyperparameters
@@ -23,6 +25,28 @@ def prepare_score(value):
         return prepare_score(value.eval_score())
     raise TypeError(f"type {type(value)} is not supported.")
 
+def map_state(state, function):
+    """Returns a copy of the nested state dictionary or list with the function applied to every value."""
+    if isinstance(state, dict):
+        return type(state)((key, map_state(value, function)) for key, value in state.items())
+    if isinstance(state, list):
+        return [map_state(value, function) for value in state]
+    return function(state)
+
+
+def tensor_to_array(value):
+    """Returns a numpy array sharing memory with the value if it is a tensor on the cpu that numpy supports."""
+    if not isinstance(value, torch.Tensor) or value.device.type != 'cpu':
+        return value
+    try:
+        return value.detach().numpy()
+    except TypeError:
+        return value
+
+
+def array_to_tensor(value):
+    return torch.from_numpy(value) if isinstance(value, np.ndarray) else value
+
 
 class MissingStateError(Exception):
     pass
@@ -60,6 +84,22 @@ class Checkpoint(object):
         self.steps: int = 0
         self.epochs: int = 0
 
+    def __reduce_ex__(self, protocol: int):
+        if protocol < 5:
+            return super().__reduce_ex__(protocol)
+        # with protocol 5, the state tensors are pickled as numpy arrays, which support out-of-band buffers
+        state = self.__dict__.copy()
+        for name in (Checkpoint.MODEL_STATE_PROPERTY, Checkpoint.OPTIMIZER_STATE_PROPERTY):
+            if state.get(name) is not None:
+                state[name] = map_state(state[name], tensor_to_array)
+        return (copyreg.__newobj__, (self.__class__,), state)
+
+    def __setstate__(self, state: dict) -> None:
+        for name in (Checkpoint.MODEL_STATE_PROPERTY, Checkpoint.OPTIMIZER_STATE_PROPERTY):
+            if state.get(name) is not None:
+                state[name] = map_state(state[name], array_to_tensor)
+        self.__dict__.update(state)
+
     def __str__(self) -> str:
         return f"member {self.uid}, step {self.steps}, epoch {self.epochs}"
 
@@ -140,6 +180,16 @@ class Checkpoint(object):
             return None
         return self.loss[Checkpoint.TEST_LABEL][self.eval_metric]
 
+    def reset_loss_group(self, group: str, keys) -> dict:
+        """Zeros the losses of the group in place and returns them. The group is created if it is missing or if its keys differ from the provided set-like keys."""
+        losses = self.loss.get(group)
+        if losses is None or losses.keys() != keys:
+            losses = self.loss[group] = dict.fromkeys(keys, 0.0)
+        else:
+            for key in losses:
+                losses[key] = 0.0
+        return losses
+
     def copy_score(self, other) -> None:
         """Replace own score with score from the other member."""
         self.loss = copy.deepcopy(other.loss)
@@ -226,11 +276,18 @@ class Checkpoint(object):
         else:
             self.optimizer_state = copy.deepcopy(other.optimizer_state)
 
+    def header(self) -> Checkpoint:
+        """Returns a copy of the checkpoint without the model- and optimizer state, which can be compared and scored like the checkpoint."""
+        header = copy.copy(self)
+        header.model_state = None
+        header.optimizer_state = None
+        return header
+
     def copy_parameters(self, other: Checkpoint) -> None:
         """Replace own hyper-parameters with the ones from the other checkpoint."""
         if not isinstance(other, self.__class__):
             raise TypeError(f"the 'other' specified was of wrong type {type(other)}, expected {self.__class__}.")
-        self.parameters = copy.deepcopy(other.parameters)
+        self.parameters = other.parameters.clone()
 
     def copy(self) -> Checkpoint:
         return copy.deepcopy(self)
@@ -249,11 +306,9 @@ class Checkpoint(object):
         self.time[tag] = duration.total_seconds()
 
     def performance_details(self) -> str:
-        strings = list()
-        for loss_group, loss_values in self.loss.items():
-            for loss_name, loss_value in loss_values.items():
-                strings.append(f"{loss_group}_{loss_name} {loss_value:.4f}")
-        return ", ".join(strings)
+        return ", ".join(f"{loss_group}_{loss_name} {loss_value:.4f}"
+            for loss_group, loss_values in self.loss.items()
+            for loss_name, loss_value in loss_values.items())
 
 
 class GenerationFullException(Exception):
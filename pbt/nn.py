@@ -1,11 +1,14 @@
 import os
+import uuid
 import random
 import itertools
+import threading
+import contextlib
 import collections
 from abc import ABC
 from copy import deepcopy
 from warnings import warn
-from typing import Callable
+from typing import Callable, Dict
 from functools import partial
 
 import torch
@@ -23,7 +26,7 @@ from pbt.utils.data import create_subset, create_subset_by_size
 class Trainer(object):
     """ A class for training the provided model with the provided hyper-parameters on the set training dataset. """
 
-    def __init__(self, model_class, optimizer_class, train_data: Dataset, batch_size: int, loss_functions: dict, loss_metric: str, step_size: int = 1):
+    def __init__(self, model_class, optimizer_class, train_data: Dataset, batch_size: int, loss_functions: dict, loss_metric: str, step_size: int = 1, cuda_sync_every: int = 32):
         if not callable(model_class):
             raise TypeError(f"the 'model_class' specified was not callable.")
         if not callable(optimizer_class):
@@ -40,6 +43,10 @@ class Trainer(object):
             raise TypeError(f"the 'step_size' specified was of wrong type {type(step_size)}, expected {int}.")
         if step_size < 1:
             raise ValueError("The 'step_size' specified was lower than 1.")
+        if not isinstance(cuda_sync_every, int):
+            raise TypeError(f"the 'cuda_sync_every' specified was of wrong type {type(cuda_sync_every)}, expected {int}.")
+        if cuda_sync_every < 1:
+            raise ValueError("The 'cuda_sync_every' specified was lower than 1.")
         self.LOSS_GROUP = 'train'
         self.model_class = model_class
         self.optimizer_class = optimizer_class
@@ -48,6 +55,7 @@ class Trainer(object):
         self.batch_size = batch_size
         self.loss_functions = loss_functions
         self.loss_metric = loss_metric
+        self.cuda_sync_every = cuda_sync_every
 
     def __create_model(self, hyper_parameters: Hyperparameters, device: str, model_state: dict = None) -> Module:
         """Create an instance of the model with the supplied hyper-parameters and optional model state"""
@@ -76,9 +84,8 @@ class Trainer(object):
             # loading optimizer state
             optimizer.load_state_dict(optimizer_state)
             # applying hyper-parameters
-            for param_name, param_value in hyper_parameters.optimizer.items():
-                for param_group in optimizer.param_groups:
-                    param_group[param_name] = param_value.value
+            for param_group in optimizer.param_groups:
+                param_group.update(hp_value_dict)
         return optimizer
 
     def __create_dataloader(self, steps_performed : int) -> DataLoader:
@@ -112,19 +119,22 @@ class Trainer(object):
         optimizer = self.__create_optimizer(model=model, hyper_parameters=checkpoint.parameters, optimizer_state=checkpoint.optimizer_state)
         # create dataloader
         dataloader = self.__create_dataloader(steps_performed = checkpoint.steps)
-        # reset loss dict
-        checkpoint.loss[self.LOSS_GROUP] = dict.fromkeys(self.loss_functions, 0.0)
+        # accumulate the losses of every metric in one tensor on the device, which avoids synchronizing with the device on every step
+        running_losses = torch.zeros(len(self.loss_functions), device=device)
+        # without synchronization the host could queue kernels for many steps ahead, so it waits on the event of an earlier step instead
+        events = collections.deque() if device.startswith('cuda') else None
         # train
         for batch_index, (x, y) in enumerate(dataloader):
             x = x.to(device, non_blocking=True)
             y = y.to(device, non_blocking=True)
             # 1. Forward pass: compute predicted y by passing x to the model.
             output = model(x)
+            step_losses = []
             for metric_type, metric_function in self.loss_functions.items():
                 if metric_type == self.loss_metric:
                     # 2. Compute loss and save loss.
                     loss = metric_function(output, y)
-                    checkpoint.loss[self.LOSS_GROUP][metric_type] += loss.item() / float(self.step_size)
+                    step_losses.append(loss.detach())
                     # 3. Before the backward pass, use the optimizer object to zero all of the gradients
                     # for the variables it will update (which are the learnable weights of the model).
                     optimizer.zero_grad()
@@ -136,25 +146,46 @@ class Trainer(object):
                     # 2. Compute loss and save loss
                     with torch.no_grad():
                         loss = metric_function(output, y)
-                    checkpoint.loss[self.LOSS_GROUP][metric_type] += loss.item() / float(self.step_size)
+                    step_losses.append(torch.as_tensor(loss, dtype=running_losses.dtype, device=device))
                 del loss
+            running_losses.add_(torch.stack(step_losses))
             del output
+            del step_losses
             checkpoint.steps += 1
+            if events is not None and batch_index % self.cuda_sync_every == 0:
+                events.append(torch.cuda.Event())
+                events[-1].record()
+                if len(events) > 2:
+                    events.popleft().synchronize()
+        # normalize and transfer the mean losses from the device at once
+        mean_losses = running_losses.div_(float(self.step_size)).tolist()
+        checkpoint.reset_loss_group(self.LOSS_GROUP, self.loss_functions.keys()).update(zip(self.loss_functions, mean_losses))
         # update number of epochs performed
         checkpoint.epochs = self.__calculate_epochs(checkpoint.steps)
         # set new state
         checkpoint.model_state = model.state_dict()
         checkpoint.optimizer_state = optimizer.state_dict()
-        # clean GPU memory
+        # release the model and optimizer, their memory is reused by the caching allocator
         del model
         del optimizer
-        torch.cuda.empty_cache()
+
+
+class _EvaluatorCache(threading.local):
+    """The dataloader and models of an evaluator, which are kept in the process between tasks. Each thread has its own, so members are evaluated concurrently."""
+    def __init__(self):
+        self.batches = None
+        self.models = dict()
+
+
+# an evaluator is pickled again with every task, so the caches of the evaluators used in this process are kept here by uid
+_resident_caches: Dict[str, _EvaluatorCache] = dict()
 
 
 class Evaluator(object):
     """ Class for evaluating the performance of the provided model on the set evaluation dataset. """
 
-    def __init__(self, model_class, test_data: Dataset, batch_size: int, loss_functions: dict, loss_group: str = 'eval', batches: int = None, shuffle: bool = False):
+    def __init__(self, model_class, test_data: Dataset, batch_size: int, loss_functions: dict, loss_group: str = 'eval', batches: int = None, shuffle: bool = False, num_workers: int = 0,
+                 eval_dtype: torch.dtype = torch.bfloat16):
         if not callable(model_class):
             raise TypeError(f"the 'model_class' specified was not callable.")
         if not isinstance(test_data, Dataset):
@@ -172,6 +203,12 @@ class Evaluator(object):
                 raise ValueError("The 'batches' specified was less than 1.")
         if not isinstance(shuffle, bool):
             raise TypeError(f"the 'shuffle' specified was of wrong type {type(shuffle)}, expected {bool}.")
+        if not isinstance(num_workers, int):
+            raise TypeError(f"the 'num_workers' specified was of wrong type {type(num_workers)}, expected {int}.")
+        if num_workers < 0:
+            raise ValueError("The 'num_workers' specified was less than 0.")
+        if eval_dtype is not None and not isinstance(eval_dtype, torch.dtype):
+            raise TypeError(f"the 'eval_dtype' specified was of wrong type {type(eval_dtype)}, expected {torch.dtype}.")
         self.model_class = model_class
         self.test_data = create_subset_by_size(
             dataset=test_data, n_samples=batches * batch_size, shuffle=shuffle) if batches is not None else test_data
@@ -179,15 +216,52 @@ class Evaluator(object):
         self.loss_functions = loss_functions
         self.loss_group = loss_group
         self.shuffle = shuffle
+        self.num_workers = num_workers
+        self.eval_dtype = eval_dtype
+        self.__uid = uuid.uuid4().hex
+        self.__cache = _resident_caches.setdefault(self.__uid, _EvaluatorCache())
+
+    def __getstate__(self):
+        # the dataloader, its worker processes and the models are not shared with other processes
+        state = self.__dict__.copy()
+        del state['_Evaluator__cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # reuse the dataloader and models of earlier copies of this evaluator in the same process
+        self.__cache = _resident_caches.setdefault(self.__uid, _EvaluatorCache())
+
+    def __create_dataloader(self) -> DataLoader:
+        """Create the dataloader once, and reuse it for every evaluation. Batches are loaded into pinned memory, so they can be copied to the device asynchronously."""
+        if self.__cache.batches is not None:
+            return self.__cache.batches
+        worker_options = dict(persistent_workers=True, prefetch_factor=4) if self.num_workers > 0 else dict()
+        self.__cache.batches = DataLoader(
+            dataset=self.test_data, batch_size=self.batch_size, shuffle=False, drop_last=False,
+            pin_memory=torch.cuda.is_available(), num_workers=self.num_workers, **worker_options)
+        return self.__cache.batches
 
     def __create_model(self, model_state: dict, device: str):
         assert isinstance(model_state, dict), "model_state is wrong type"
         assert isinstance(device, str), "device is of wrong type"
-        model = self.model_class().to(device)
+        # the model is created once per device, and the state of each checkpoint is loaded into it
+        models = self.__cache.models
+        if device not in models:
+            models[device] = self.model_class().to(device)
+        model = models[device]
         model.load_state_dict(model_state)
         model.eval()
         return model
 
+    def __autocast(self, device: str):
+        """Returns a mixed precision context for the forward pass on cuda devices, if an evaluation dtype is set."""
+        if self.eval_dtype is None or not device.startswith('cuda'):
+            return contextlib.nullcontext()
+        # older devices without bfloat16 support fall back to float16
+        dtype = torch.float16 if self.eval_dtype == torch.bfloat16 and not torch.cuda.is_bf16_supported() else self.eval_dtype
+        return torch.autocast(device_type='cuda', dtype=dtype)
+
     def __call__(self, checkpoint: Checkpoint, device: str = None):
         """Evaluate checkpoint model."""
         if not isinstance(checkpoint, Checkpoint):
@@ -196,40 +270,46 @@ class Evaluator(object):
             device = get_global_device()
         if not isinstance(device, str):
             raise TypeError(f"the 'device' specified was of wrong type {type(device)}, expected {str}.")
+        self.__evaluate(checkpoint, device)
+
+    def __evaluate(self, checkpoint: Checkpoint, device: str):
         # preparing model
         model = self.__create_model(model_state=checkpoint.model_state, device=device)
         # prepare batches
-        batches = DataLoader(dataset=self.test_data, batch_size=self.batch_size, shuffle=False, drop_last=False)
+        batches = self.__create_dataloader()
         num_batches = len(batches)
-        # reset loss dict
-        checkpoint.loss[self.loss_group] = dict.fromkeys(self.loss_functions, 0.0)
+        # accumulate the losses of every metric in one tensor on the device, which avoids synchronizing with the device on every batch
+        running_losses = torch.zeros(len(self.loss_functions), device=device)
+        autocast = self.__autocast(device)
         # evaluate
-        for x, y in batches:
-            x = x.to(device, non_blocking=True)
-            y = y.to(device, non_blocking=True)
-            with torch.no_grad():
-                output = model(x)
-            for metric_type, metric_function in self.loss_functions.items():
-                with torch.no_grad():
-                    loss = metric_function(output, y)
-                checkpoint.loss[self.loss_group][metric_type] += loss.item() / float(num_batches)
-                del loss
-            del output
-        # clean GPU memory
-        del model
-        torch.cuda.empty_cache()
+        with torch.inference_mode():
+            for x, y in batches:
+                x = x.to(device, non_blocking=True)
+                y = y.to(device, non_blocking=True)
+                # the forward pass runs in mixed precision, while the metrics are computed in full precision
+                with autocast:
+                    output = model(x)
+                output = output.float()
+                # some metrics are computed on the cpu and returned as numbers
+                running_losses.add_(torch.stack([
+                    torch.as_tensor(metric_function(output, y), dtype=running_losses.dtype, device=device)
+                    for metric_function in self.loss_functions.values()]))
+            # normalize and transfer the mean losses from the device at once
+            mean_losses = running_losses.div_(num_batches).tolist()
+        checkpoint.reset_loss_group(self.loss_group, self.loss_functions.keys()).update(zip(self.loss_functions, mean_losses))
 
 
 class Step():
     def __init__(self, model_class: HyperNet, optimizer_class: Optimizer, train_data: Dataset, test_data: Dataset, step_size: int, batch_size: int,
-                 loss_functions: dict, loss_metric: str):
+                 loss_functions: dict, loss_metric: str, num_workers: int = 0):
         # n batches for training
         self.trainer = Trainer(
             model_class=model_class, optimizer_class=optimizer_class, train_data=train_data, step_size=step_size,
             batch_size=batch_size, loss_functions=loss_functions, loss_metric=loss_metric)
         # n random batches for evaluation
         self.evaluator = Evaluator(
-            model_class=model_class, test_data=test_data, batch_size=batch_size, loss_functions=loss_functions, loss_group='eval', shuffle=False)
+            model_class=model_class, test_data=test_data, batch_size=batch_size, loss_functions=loss_functions, loss_group='eval', shuffle=False,
+            num_workers=num_workers)
 
     def __call__(self, checkpoint: Checkpoint, device: str = None):
         if not isinstance(checkpoint, Checkpoint):
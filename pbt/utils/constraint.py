@@ -2,21 +2,12 @@ import math
 import random 
 
 def translate(value, left_min, left_max, right_min, right_max):
-    # Calculate the span of each range
-    left_span = left_max - left_min
-    right_span = right_max - right_min
-    # normalize the value from the left range into a float between 0 and 1
-    value_normalized = float(value - left_min) / float(left_span)
-    # Convert the normalize value range into a value in the right range.
-    return right_min + (value_normalized * right_span)
+    # normalize the value from the left range into a float between 0 and 1 and
+    # convert it into a value in the right range in a single expression
+    return right_min + (value - left_min) / (left_max - left_min) * (right_max - right_min)
 
 def clip(value, min_value, max_value):
-    if value <= min_value:
-        return min_value
-    elif value >= max_value:
-        return max_value
-    else:
-        return value
+    return min(max(value, min_value), max_value)
 
 def reflect(value, min_value, max_value):
     span = max_value - min_value
@@ -2,6 +2,8 @@ import math
 import random
 from typing import Sequence
 
+import numpy as np
+
 def randn(mean: float, std: float):
     """Generate a random value from a normal distribution."""
     return random.normalvariate(mean, std)
@@ -13,13 +15,28 @@ def randc(mean: float, std: float):
         p = random.random()
     return mean + std * math.tan(math.pi * (p - 0.5))
 
+def randc_truncated(mean: float, std: float, minimum: float):
+    """Generate a random value of at least the minimum from a Cauchy distribution, by sampling the inverse of its cumulative distribution function above the minimum."""
+    p_minimum = 0.5 + math.atan((minimum - mean) / std) / math.pi
+    p = random.uniform(p_minimum, 1.0)
+    return max(minimum, mean + std * math.tan(math.pi * (p - 0.5)))
+
 def mean_wl(S, weights: Sequence[float]) -> float:
     """
     The weighted Lehmer mean of a tuple x of positive real numbers,
     with respect to a tuple w of positive weights.
     """
-    def weight(weights, k):
-        return weights[k] / sum(weights)
-    A = sum(weight(weights, k) * s**2 for k, s in enumerate(S))
-    B = sum(weight(weights, k) * s for k, s in enumerate(S))
-    return A / B
\ No newline at end of file
+    # the normalization of the weights cancels out, so both sums are accumulated in one pass without it
+    A = 0.0
+    B = 0.0
+    for s, w in zip(S, weights):
+        B += w * s
+        A += w * s * s
+    return A / B
+
+def lehmer_mean(S: np.ndarray, weights: np.ndarray) -> float:
+    """
+    The weighted Lehmer mean of an array S of positive real numbers,
+    with respect to an array of positive weights. The normalization of the weights cancels out.
+    """
+    return float(np.dot(weights, S * S) / np.dot(weights, S))
@@ -1,5 +1,8 @@
 
+import pickle
+from collections.abc import MutableMapping
 from multiprocessing import Manager
+from multiprocessing.shared_memory import SharedMemory
 
 class Counter(object):
     def __init__(self, manager: Manager, value: int):
@@ -16,4 +19,74 @@ class Counter(object):
 
     @property
     def value(self):
-        return self.__value.value
\ No newline at end of file
+        return self.__value.value
+
+class SharedMemoryDict(MutableMapping):
+    """
+    Dictionary that can be shared between processes. Each value is pickled once into its own shared memory block,
+    and only the name and size of the block is stored in a managed dictionary, so the values never pass through the manager process.
+    The values are expected to be set by the process that created the dictionary, which keeps the blocks open until they are replaced, deleted or closed.
+    """
+
+    # a value replaced while it is read is looked up again a bounded number of times
+    MAX_READ_ATTEMPTS = 8
+
+    def __init__(self, manager: Manager):
+        self.__index = manager.dict()
+        self.__blocks = dict()
+
+    def __getstate__(self):
+        # the open blocks belong to the owning process
+        return {'index': self.__index}
+
+    def __setstate__(self, state):
+        self.__index = state['index']
+        self.__blocks = dict()
+
+    def __getitem__(self, key):
+        for _ in range(self.MAX_READ_ATTEMPTS):
+            name, size = self.__index[key]
+            try:
+                block = SharedMemory(name=name)
+            except FileNotFoundError:
+                # the value was replaced while reading the index
+                continue
+            try:
+                with block.buf[:size] as buffer:
+                    return pickle.loads(buffer)
+            finally:
+                block.close()
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        block = SharedMemory(create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        self.__index[key] = (block.name, len(data))
+        self.__release(key)
+        self.__blocks[key] = block
+
+    def __delitem__(self, key):
+        del self.__index[key]
+        self.__release(key)
+
+    def __iter__(self):
+        return iter(self.__index.keys())
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, key):
+        return key in self.__index
+
+    def close(self):
+        """Unlinks every block owned by this process. The values of the blocks can no longer be read afterwards."""
+        for key in list(self.__blocks):
+            self.__release(key)
+
+    def __release(self, key):
+        block = self.__blocks.pop(key, None)
+        if block is None:
+            return
+        block.close()
+        block.unlink()
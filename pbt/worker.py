@@ -1,14 +1,13 @@
 import os
 import gc
-import sys
+import pickle
 import random
-from functools import partial
-from typing import Callable, Union, Sequence, Generator, Any
+from typing import Callable, Union, Sequence, Generator, Any, FrozenSet
 from dataclasses import dataclass
-from threading import Thread
 from multiprocessing.managers import EventProxy
 from multiprocessing.queues import Queue
 from multiprocessing.pool import ThreadPool
+from multiprocessing.reduction import ForkingPickler
 
 import torch
 import numpy as np
@@ -17,17 +16,6 @@ from pbt.device import set_global_device, initialize_cuda_device
 
 # set torch multiprocessing settings
 torch.multiprocessing.set_sharing_strategy('file_system')
-# various settings for reproducibility
-# set random seed
-random.seed(0)
-np.random.seed(0)
-torch.manual_seed(0)
-torch.cuda.manual_seed(0)
-torch.cuda.manual_seed_all(0)
-# set torch settings
-torch.backends.cudnn.deterministic = True
-torch.backends.cudnn.benchmark = False
-torch.backends.cudnn.enabled = True
 
 STOP_FLAG = None
 
@@ -43,27 +31,53 @@ class FailMessage:
     sender_id: int
     text: str
     exception: str = None
+    n_failed: int = 0
+
+
+class PickledFunction:
+    """Wraps a function that is pickled once on creation, so sending it to several processes does not pickle it again for each of them."""
+    def __init__(self, function: Callable[..., Any]):
+        if not callable(function):
+            raise TypeError(f"the 'function' specified was not callable.")
+        self.function = function
+        # the forking pickler shares tensor storages with the receiving processes instead of copying them
+        self.data = bytes(ForkingPickler.dumps(function))
+
+    def __getstate__(self) -> dict:
+        return {'data': self.data}
+
+    def __setstate__(self, state: dict) -> None:
+        self.data = state['data']
+        self.function = pickle.loads(self.data)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.function(*args, **kwargs)
 
 
 class AsyncThreadTask:
-    def __init__(self, return_queue, function: Callable[..., Any], parameters: Sequence[Any]):
-        if return_queue is None:
-            raise TypeError(f"the 'return_queue' specified was None.")
+    """A function to run on a sequence of parameters. The results are returned tagged with the call_id, which identifies the call the task belongs to."""
+    def __init__(self, function: Callable[..., Any], parameters: Sequence[Any], call_id: int = 0):
         if not callable(function):
             raise TypeError(f"the 'function' specified was not callable.")
         if not isinstance(parameters, (list, tuple)):
             raise TypeError(f"the 'parameters' specified was of wrong type {type(parameters)}, expected {list} or {tuple}.")
-        self.return_queue = return_queue
+        if not isinstance(call_id, int):
+            raise TypeError(f"the 'call_id' specified was of wrong type {type(call_id)}, expected {int}.")
         self.function = function
         self.parameters = parameters
+        self.call_id = call_id
 
-    def run(self) -> Generator[Any, None, None]:
-        yield from map_to_threads(self.function, self.parameters)
+    def run(self, pool: ThreadPool = None) -> Generator[Any, None, None]:
+        """Runs the function on every parameter concurrently, on the provided thread pool if any, and yields the results as they are ready."""
+        if pool is None:
+            yield from map_to_threads(self.function, self.parameters)
+        else:
+            yield from pool.imap_unordered(self.function, self.parameters)
 
 
 class DeviceWorker(torch.multiprocessing.Process):
-    """A worker process that train and evaluate any available checkpoints provided from the receive_queue. """
-    def __init__(self, uid: Union[int, str], end_event: EventProxy, receive_queue: Queue, device: str, random_seed: int = 0, verbose: bool = False):
+    """A worker process that train and evaluate any available checkpoints provided from the receive_queue, and puts the results on the return_queue. """
+    def __init__(self, uid: Union[int, str], end_event: EventProxy, receive_queue: Queue, return_queue: Queue, device: str, random_seed: int = 0, deterministic: bool = False, cpus: FrozenSet[int] = None, verbose: bool = False):
         super().__init__()
         if not isinstance(uid, (int, str)):
             raise TypeError(f"the 'uid' specified was of wrong type {type(uid)}, expected {str} or {int}.")
@@ -71,17 +85,26 @@ class DeviceWorker(torch.multiprocessing.Process):
             raise TypeError(f"the 'end_event' specified was of wrong type {type(end_event)}, expected {EventProxy}.")
         if not isinstance(receive_queue, Queue):
             raise TypeError(f"the 'receive_queue' specified was of wrong type {type(receive_queue)}, expected {Queue}.")
+        if not isinstance(return_queue, Queue):
+            raise TypeError(f"the 'return_queue' specified was of wrong type {type(return_queue)}, expected {Queue}.")
         if not isinstance(device, str):
             raise TypeError(f"the 'device' specified was of wrong type {type(device)}, expected {str}.")
         if not isinstance(random_seed, int):
             raise TypeError(f"the 'random_seed' specified was of wrong type {type(random_seed)}, expected {int}.")
+        if not isinstance(deterministic, bool):
+            raise TypeError(f"the 'deterministic' specified was of wrong type {type(deterministic)}, expected {bool}.")
+        if cpus is not None and not isinstance(cpus, frozenset):
+            raise TypeError(f"the 'cpus' specified was of wrong type {type(cpus)}, expected {frozenset}.")
         if not isinstance(verbose, bool):
             raise TypeError(f"the 'verbosity' specified was of wrong type {type(verbose)}, expected {bool}.", )
         self.uid = uid
         self.end_event = end_event
         self.receive_queue = receive_queue
+        self.return_queue = return_queue
         self.random_seed = random_seed
+        self.deterministic = deterministic
         self.device = device
+        self.cpus = cpus
         self.verbose = verbose
         # initialize CUDA if device is a GPU
         if device.startswith('cuda'):
@@ -94,15 +117,35 @@ class DeviceWorker(torch.multiprocessing.Process):
         full_message = f"{prefix}: {message}"
         print(full_message)
 
-    def run(self):
-        self.__log("running...")
-        # set random state for reproducibility
+    def __seed(self):
         random.seed(self.random_seed)
         np.random.seed(self.random_seed)
         torch.manual_seed(self.random_seed)
         torch.cuda.manual_seed(self.random_seed)
+
+    def __reset(self):
+        """Releases cached memory and resets the random state, so the worker can continue after a failed task."""
+        gc.collect()
+        if self.device.startswith('cuda'):
+            torch.cuda.empty_cache()
+        self.__seed()
+
+    def run(self):
+        self.__log("running...")
+        if self.cpus:
+            # keep the worker and the threads it creates on its own cpus, with one intra-op thread per cpu
+            os.sched_setaffinity(0, self.cpus)
+            torch.set_num_threads(len(self.cpus))
+        # set random state for reproducibility
+        self.__seed()
+        # deterministic kernels are reproducible, while the cudnn autotuner picks the fastest kernel for each input shape
+        torch.backends.cudnn.deterministic = self.deterministic
+        torch.backends.cudnn.benchmark = not self.deterministic
         # set global processing device
         set_global_device(self.device)
+        # the thread pool is reused between tasks, and only replaced when a task has more parameters than it has threads
+        thread_pool = None
+        n_threads = 0
         # start worker rutine
         while not self.end_event.is_set():
             # get next checkpoint from train queue
@@ -114,22 +157,38 @@ class DeviceWorker(torch.multiprocessing.Process):
             if not isinstance(task, AsyncThreadTask):
                 self.__log("received wrong task-type.")
                 raise TypeError(f"the 'task' received was of wrong type {type(task)}, expected {AsyncThreadTask}.", )
+            if len(task.parameters) > n_threads:
+                if thread_pool is not None:
+                    thread_pool.close()
+                n_threads = len(task.parameters)
+                thread_pool = ThreadPool(processes=n_threads)
+            n_returned = 0
             try:
                 # run tasks and return results each by each
                 # the moment they are ready
-                [task.return_queue.put(result) for result in task.run()]
+                for result in task.run(thread_pool):
+                    self.return_queue.put((task.call_id, result))
+                    n_returned += 1
             except Exception:
                 import traceback
                 self.__log("task excecution failed! Exception:")
                 traceback_stacktrace = traceback.format_exc()
                 self.__log(str(traceback_stacktrace))
-                fail_message = FailMessage(self.uid, "task excecution failed!", str(traceback_stacktrace))
-                task.return_queue.put(fail_message)
+                fail_message = FailMessage(self.uid, "task excecution failed!", str(traceback_stacktrace), len(task.parameters) - n_returned)
+                self.return_queue.put((task.call_id, fail_message))
                 # delete failed task
                 del task
-                break
+                # recover in place instead of stopping, after the remaining members of the failed task are dropped and the running ones have returned
+                thread_pool.terminate()
+                thread_pool.join()
+                thread_pool = None
+                n_threads = 0
+                self.__reset()
             finally:
                 # Explicitly trigger garbage collection to make
                 # sure that all destructors are called
                 gc.collect()
+        if thread_pool is not None:
+            thread_pool.close()
+            thread_pool.join()
         self.__log("stopped.")
\ No newline at end of file
@@ -1,34 +1,33 @@
 import os
-import time
+import queue
 import random
 import warnings
 import itertools
-from typing import List, Sequence, Callable, Generator, Any
+from typing import List, Sequence, Callable, Generator, Any, FrozenSet
 from multiprocessing.managers import SyncManager
 from multiprocessing.pool import ThreadPool
 
-import numpy as np
 import torch
 
 from pbt.utils.iterable import is_iterable, split
-from pbt.worker import STOP_FLAG, FailMessage, AsyncThreadTask, DeviceWorker
-from pbt.utils.cuda import get_gpu_memory_stats
+from pbt.worker import STOP_FLAG, FailMessage, PickledFunction, AsyncThreadTask, DeviceWorker
 
 
-# various settings for reproducibility
-# set random seed
-random.seed(0)
-np.random.seed(0)
-torch.manual_seed(0)
-torch.cuda.manual_seed(0)
-torch.cuda.manual_seed_all(0)
-# set torch settings
-torch.backends.cudnn.deterministic = True
-torch.backends.cudnn.benchmark = False
-torch.backends.cudnn.enabled = True
+def split_cpus(n: int) -> List[FrozenSet[int]]:
+    """Splits the cpus available to this process into n disjoint, contiguous sets. Returns None if cpu affinity is unsupported or there are fewer cpus than n."""
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < n:
+        return None
+    return [frozenset(chunk) for chunk in split(cpus, n)]
+
 
 class WorkerPool:
-    def __init__(self, manager: SyncManager, devices: Sequence[str] = ('cpu',), n_jobs: int = 1, verbose: int = 0):
+    # seconds to wait for a result before checking whether any worker has stopped without reporting
+    LIVENESS_TIMEOUT = 5.0
+
+    def __init__(self, manager: SyncManager, devices: Sequence[str] = ('cpu',), n_jobs: int = 1, cuda_alloc_conf: str = None, deterministic: bool = False, verbose: int = 0):
         if not isinstance(manager, SyncManager):
             raise TypeError(f"the manager specified was of wrong type {type(manager)}, expected {SyncManager}.")
         if not isinstance(devices, (list, tuple)):
@@ -39,17 +38,34 @@ class WorkerPool:
             raise TypeError(f"the n_jobs specified was of wrong type {type(n_jobs)}, expected {int}.")
         if n_jobs < len(devices):
             raise ValueError(f"the n_jobs specified must be larger or equal the number of devices, i.e. {n_jobs} < {len(devices)}.")
+        if cuda_alloc_conf is not None and not isinstance(cuda_alloc_conf, str):
+            raise TypeError(f"the cuda_alloc_conf specified was of wrong type {type(cuda_alloc_conf)}, expected {str}.")
+        if not isinstance(deterministic, bool):
+            raise TypeError(f"the deterministic specified was of wrong type {type(deterministic)}, expected {bool}.")
         if not isinstance(verbose, int):
             raise TypeError(f"the manager specified was of wrong type {type(verbose)}, expected {int}.")
         self.verbose = verbose
+        if any(device.startswith('cuda') for device in devices):
+            # growable segments keep the long-lived workers from fragmenting their memory between members,
+            # and the variable must be set before the workers are started in order to be inherited by them
+            if cuda_alloc_conf is None:
+                os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True')
+            else:
+                os.environ['PYTORCH_CUDA_ALLOC_CONF'] = cuda_alloc_conf
         self._manager = manager
         self._end_event = manager.Event()
-        send_queues = [torch.multiprocessing.Queue() for _ in devices]
+        # all workers pull their tasks from the same queue, so an idle worker takes the next task regardless of its device
+        self._task_queue = torch.multiprocessing.Queue()
+        # results are returned through one long-lived pipe instead of a new manager queue for every call to imap
+        self._return_queue = torch.multiprocessing.Queue()
+        # results of earlier calls that failed may still arrive, and are told apart by the id of the call
+        self._call_id = 0
+        # each worker is pinned to its own share of the cpus, so the workers are not migrated between the cores of each other
+        cpu_sets = split_cpus(n_jobs) or itertools.repeat(None)
         self._workers: List[DeviceWorker] = [
-            DeviceWorker(uid=uid, end_event=self._end_event, receive_queue=send_queue,
-                   device=device, random_seed=uid, verbose=verbose > 1)
-            for uid, send_queue, device in zip(range(n_jobs), itertools.cycle(send_queues), itertools.cycle(devices))]
-        self._workers_iterator = itertools.cycle(self._workers)
+            DeviceWorker(uid=uid, end_event=self._end_event, receive_queue=self._task_queue, return_queue=self._return_queue,
+                   device=device, random_seed=uid, deterministic=deterministic, cpus=cpus, verbose=verbose > 1)
+            for uid, device, cpus in zip(range(n_jobs), itertools.cycle(devices), cpu_sets)]
 
     def _print(self, message: str) -> None:
         if self.verbose < 1:
@@ -70,10 +86,19 @@ class WorkerPool:
         self._stop_worker(worker)
         # spawn new worker
         self._print(f"spawning new worker with uid {worker.uid}...")
-        self._workers[worker_id] = DeviceWorker(uid=worker.uid, end_event=self._end_event, receive_queue=worker.receive_queue,
-                                          device=worker.device, random_seed=worker.uid, verbose=self.verbose > 1)
+        self._workers[worker_id] = DeviceWorker(uid=worker.uid, end_event=self._end_event, receive_queue=self._task_queue,
+                                          return_queue=self._return_queue, device=worker.device, random_seed=worker.uid,
+                                          deterministic=worker.deterministic, cpus=worker.cpus, verbose=self.verbose > 1)
         self._workers[worker_id].start()
 
+    def _discard_pending_tasks(self) -> None:
+        """Removes the tasks no worker has started yet from the task queue."""
+        while True:
+            try:
+                self._task_queue.get_nowait()
+            except queue.Empty:
+                return
+
     def _stop_worker(self, worker: DeviceWorker) -> None:
         worker.terminate()
         worker.join()
@@ -82,7 +107,9 @@ class WorkerPool:
     def start(self) -> None:
         if any(worker.is_alive() for worker in self._workers):
             raise Exception("service is already running. Consider calling stop() when service is not in use.")
-        [worker.start() for worker in self._workers]
+        # starting a worker launches a new interpreter, so the workers are started concurrently
+        with ThreadPool(processes=len(self._workers)) as pool:
+            pool.map(DeviceWorker.start, self._workers)
 
     def stop(self) -> None:
         self._end_event.set()
@@ -90,7 +117,8 @@ class WorkerPool:
             if not any(worker.is_alive() for worker in self._workers):
                 warnings.warn("service is not running.")
                 return
-            [worker.receive_queue.put(STOP_FLAG) for worker in self._workers]
+            # each worker consumes exactly one stop flag from the shared queue
+            [self._task_queue.put(STOP_FLAG) for _ in self._workers]
             [worker.join() for worker in self._workers]
             [worker.close() for worker in self._workers]
         except ValueError:
@@ -107,36 +135,56 @@ class WorkerPool:
             random.shuffle(parameters)
         n_sent = 0
         n_returned = 0
+        n_failed = 0
         failed_workers = set()
-        return_queue = self._manager.Queue()
+        return_queue = self._return_queue
+        self._call_id += 1
         parameters_chunks = split(parameters, len(self._workers))
+        # the function is sent with the task of every worker, so it is pickled once instead of once for each task
+        if len(self._workers) > 1:
+            function = PickledFunction(function)
         self._print(f"queuing parameters...")
-        for params, worker in zip(parameters_chunks, self._workers_iterator):
+        for params in parameters_chunks:
             if len(params) == 0:
                 continue
-            task = AsyncThreadTask(return_queue=return_queue, function=function, parameters=params)
-            worker.receive_queue.put(task)
+            task = AsyncThreadTask(function=function, parameters=params, call_id=self._call_id)
+            self._task_queue.put(task)
             n_sent += len(params)
         self._print(f"awaiting results...")
-        while n_returned != n_sent and len(failed_workers) < len(self._workers):
-            result = return_queue.get()
+        while n_returned + n_failed != n_sent and len(failed_workers) < len(self._workers):
+            try:
+                call_id, result = return_queue.get(timeout=self.LIVENESS_TIMEOUT)
+            except queue.Empty:
+                stopped_workers = [worker.uid for worker in self._workers if not worker.is_alive() and worker.uid not in failed_workers]
+                if not stopped_workers:
+                    continue
+                for worker_id in stopped_workers:
+                    self._on_fail_message(FailMessage(worker_id, "worker stopped without reporting"))
+                    failed_workers.add(worker_id)
+                # the results of a stopped worker never arrive, so there is no point in waiting for the rest
+                break
+            if call_id != self._call_id:
+                continue
             if isinstance(result, FailMessage):
                 self._on_fail_message(result)
                 failed_workers.add(result.sender_id)
+                n_failed += result.n_failed
                 continue
             n_returned += 1
             yield result
-        # check if all processes were successful
-        if not return_queue.empty():
-            raise Exception("return queue is not empty.")
-        elif len(failed_workers) == len(self._workers):
+        if n_returned + n_failed != n_sent:
+            self._discard_pending_tasks()
+        # workers recover from failed tasks by themselves, and are only replaced if their process has stopped
+        for worker_id in failed_workers:
+            if not self._workers[worker_id].is_alive():
+                self._respawn(worker_id)
+        # check if all processes were successful, where the counts are exact unlike the size of the queue
+        if len(failed_workers) == len(self._workers):
             raise Exception("all workers failed.")
         elif n_returned < n_sent:
             if failed_workers:
                 raise Exception(f"{len(failed_workers)} workers failed.")
             else:
                 raise Exception(f"{n_sent - n_returned} one or more parameters failed.")
-        elif failed_workers:
-            self._respawn(failed_workers)
         else:
             self._print("all parameters were executed successfully.")
\ No newline at end of file
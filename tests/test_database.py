@@ -1,10 +1,12 @@
 import unittest
 import shutil
+import tempfile
 import itertools
+from types import SimpleNamespace
 
 import torch
 
-from pbt.database import ReadOnlyDatabase
+from pbt.database import ReadOnlyDatabase, Database
 
 DATABASE_PATH = "path/to/database/"
 
@@ -24,4 +26,46 @@ class TestDatabase(unittest.TestCase):
         self.assertTrue(0 in self.database)
         self.assertFalse(50 in self.database)
         list(self.database.entries(0))
-        list(itertools.islice(self.database, 0, 10))
\ No newline at end of file
+        list(itertools.islice(self.database, 0, 10))
+
+def create_entry(uid: int, steps: int) -> SimpleNamespace:
+    return SimpleNamespace(uid=uid, steps=steps, score=uid + steps / 10)
+
+def create_header(entry: SimpleNamespace) -> tuple:
+    return (entry.uid, entry.steps)
+
+class TestDatabaseLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = Database(self.directory, "log", aggregate_entries=True, header_function=create_header)
+        self.database.update_all((uid, steps, create_entry(uid, steps)) for uid in range(3) for steps in (1, 2, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries(self):
+        self.assertEqual(len(self.database), 9)
+        self.assertTrue(1 in self.database)
+        self.assertFalse(3 in self.database)
+        self.assertEqual(self.database.entry(1, 2), create_entry(1, 2))
+        self.assertTrue(self.database.entry(1, 4) is None)
+        self.assertEqual([entry.steps for entry in self.database.entries(1)], [1, 2, 3])
+        self.assertEqual(sorted(self.database.uids()), ['0', '1', '2'])
+
+    def test_headers(self):
+        self.assertEqual(sorted(self.database.get_last_headers()), [(0, 3), (1, 3), (2, 3)])
+
+    def test_to_dict(self):
+        entries = self.database.to_dict()
+        self.assertEqual({uid: sorted(uid_entries) for uid, uid_entries in entries.items()}, {'0': [1, 2, 3], '1': [1, 2, 3], '2': [1, 2, 3]})
+        self.assertEqual(entries['2'][3], create_entry(2, 3))
+        # the cached entries of a uid are read again when its log is appended to
+        self.database.update(0, 4, create_entry(0, 4))
+        self.assertEqual(sorted(self.database.to_dict()['0']), [1, 2, 3, 4])
+
+    def test_read_only(self):
+        database = ReadOnlyDatabase(self.database.path)
+        self.assertEqual(len(database), 9)
+        self.assertEqual(database.entry(2, 1), create_entry(2, 1))
+        self.assertEqual(sorted(entry.uid for entry in database.get_last()), [0, 1, 2])
@@ -0,0 +1,52 @@
+import unittest
+
+from pbt.member import Checkpoint, Generation
+from pbt.hyperparameters import ContiniousHyperparameter, Hyperparameters
+from pbt.evolution import ExploitAndExplore, SHADE
+
+def create_member(uid: int, score: float) -> Checkpoint:
+    parameters = Hyperparameters(general_params={'a': ContiniousHyperparameter(0.0, 1.0, value=uid / 10)})
+    member = Checkpoint(uid, parameters, loss_metric='loss', eval_metric='acc', minimize=False)
+    member.loss[Checkpoint.EVAL_LABEL] = {'acc': score}
+    member.model_state = dict()
+    member.optimizer_state = dict()
+    return member
+
+def train(generation: Generation, uid: int, score: float) -> None:
+    member = generation[uid].copy()
+    member.loss[Checkpoint.EVAL_LABEL]['acc'] = score
+    generation.update(member)
+
+class TestEvolution(unittest.TestCase):
+
+    def setUp(self):
+        self.generation = Generation(members=[create_member(uid, float(uid)) for uid in range(5)])
+
+    def test_exploit_and_explore_ranks_trained_generation(self):
+        evolver = ExploitAndExplore(exploit_factor=0.2)
+        # the evolve function is created before the generation is trained, like in the controller
+        with evolver.next(self.generation) as evolve_function:
+            train(self.generation, uid=0, score=10.0)
+            member = self.generation[0]
+            evolved = evolve_function(member)
+            self.assertIs(evolved, member)
+            self.assertEqual(evolved.eval_score(), 10.0)
+
+    def test_exploit_and_explore_demotes_overtaken_elitist(self):
+        evolver = ExploitAndExplore(exploit_factor=0.2)
+        with evolver.next(self.generation) as evolve_function:
+            train(self.generation, uid=0, score=10.0)
+            # the elitist of the previous generation is overtaken, so it exploits the new elitist
+            evolved = evolve_function(self.generation[4])
+            self.assertEqual(evolved.uid, 4)
+            self.assertEqual(evolved.eval_score(), 10.0)
+
+    def test_shade_ranks_trained_generation(self):
+        evolve_function = SHADE._Evolver(
+            generation=self.generation, fitness_function=lambda member: None, memory=None, archive=None,
+            p=0.2, f_min=0.0, f_max=1.0, state_sharing=False)
+        train(self.generation, uid=0, score=10.0)
+        self.assertEqual(evolve_function._sample_pbest_member().uid, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import warnings
 import random
 import copy
 
-from pbt.hyperparameters import ContiniousHyperparameter, DiscreteHyperparameter, Hyperparameters
+from pbt.hyperparameters import ContiniousHyperparameter, DiscreteHyperparameter, Hyperparameters, HyperparameterPopulation
 from pbt.utils.iterable import unwrap_iterable, singular
 
 class TestHyperparameters(unittest.TestCase):
@@ -44,6 +44,10 @@ class TestHyperparameters(unittest.TestCase):
         self.assertEqual(f.value, 50)
         g = a / 2
         self.assertEqual(g.value, 25)
+        with self.assertRaises(TypeError):
+            a + "x"
+        with self.assertRaises(TypeError):
+            a - DiscreteHyperparameter('A', 'B', 'C', value='B')
 
     def test_categorical_hyperparameters(self):
         c_hp = DiscreteHyperparameter('A','B','C','D','E','F','G','H','I','J','K', value='B')
@@ -95,4 +99,37 @@ class TestHyperparameters(unittest.TestCase):
         self.assertNotEqual(c, a)
         for hp in a:
             hp.normalized = 0.5
-        self.assertTrue(all(hp.normalized == 0.5 for hp in a))
\ No newline at end of file
+        self.assertTrue(all(hp.normalized == 0.5 for hp in a))
+
+    def test_hyperparameter_population(self):
+        members = [Hyperparameters(
+            optimizer = {
+                'a': ContiniousHyperparameter(0, 100, value=50),
+                'b': ContiniousHyperparameter(0.0, 1.0, value=0.5, constraint='reflect'),
+                'c': DiscreteHyperparameter('A','B','C','D','E','F','G','H','I','J','K', value='B')
+                }) for _ in range(3)]
+        population = HyperparameterPopulation(members)
+        self.assertEqual(population.shape, (3, 3))
+        population.update(lambda values: values * 3.0)
+        self.assertTrue(all(value == 1.0 for value in population.values[:, 0]))
+        self.assertAlmostEqual(population.values[0, 1], 0.5)
+        self.assertAlmostEqual(population.values[0, 2], 0.3)
+        population.apply()
+        for member, row in zip(members, population.denormalize()):
+            self.assertEqual([hp.value for hp in member], list(row))
+        self.assertEqual(list(population.denormalize()[0]), [100, 0.5, 'D'])
+        population.sample_uniform()
+        self.assertTrue(((population.values >= 0.0) & (population.values <= 1.0)).all())
+
+    def test_normalized_array(self):
+        hps = Hyperparameters(
+            optimizer = {
+                'a': ContiniousHyperparameter(0, 100, value=50),
+                'b': ContiniousHyperparameter(0.0, 1.0, value=0.5, constraint='reflect')
+                })
+        self.assertEqual(hps.normalized.tolist(), [0.5, 0.5])
+        hps.normalized = hps.normalized * [3.0, 1.5]
+        self.assertEqual(hps['optimizer/a'].value, 100)
+        self.assertAlmostEqual(hps['optimizer/b'].normalized, 0.75)
+        with self.assertRaises(ValueError):
+            hps.normalized = [0.5]